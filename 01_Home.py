@@ -2,11 +2,15 @@
 # Imports
 import streamlit as st
 from load import init_page
+from prefetch import prefetch_pages
 
 # ----------------------------
 # Initialize page
 init_page(pg_title="JSK's Stats", pg_icon=":stars:", title=":stars: Home")
 
+# Load the other pages' data in the background while the visitor reads this
+prefetch_pages()
+
 
 # ----------------------------
 # Main Page
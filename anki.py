@@ -0,0 +1,131 @@
+import json
+import os
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+# ----------------------------
+# Anki review log store
+
+# The review log is kept as a directory of Arrow IPC files, one per ingest,
+# which readers memory-map. The export is a CSV of Anki's revlog table whose
+# `id` column is the review time in epoch milliseconds.
+ANKI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "anki")
+STATE_FILE = "state.json"
+CSV_BLOCK_SIZE = 16 * 1024 * 1024
+
+
+def read_state(store_dir: str = ANKI_DIR) -> dict:
+    try:
+        with open(os.path.join(store_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _parts(store_dir: str) -> list:
+    return sorted(
+        os.path.join(store_dir, p)
+        for p in os.listdir(store_dir)
+        if p.endswith(".arrow")
+    )
+
+
+def _last_line(f, size: int) -> bytes:
+    """
+    Last non-empty line of a file, without its line break.
+    """
+    block = 4096
+    while True:
+        start = max(size - block, 0)
+        f.seek(start)
+        data = f.read(size - start).rstrip(b"\r\n")
+        if b"\n" in data or start == 0:
+            return data.rsplit(b"\n", 1)[-1]
+        block *= 2
+
+
+def ingest_anki_csv(csv_path: str, store_dir: str = ANKI_DIR) -> str:
+    """
+    Append the reviews of a new Anki export to the store and return it.
+
+    Exports only ever grow at the end, so the byte offset and last line of
+    the previously ingested export are remembered. If the new export still
+    has that line at that offset, only the bytes after it are parsed;
+    otherwise the whole export is parsed and only reviews with an id past
+    the last ingested one are kept.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    state = read_state(store_dir)
+    size = os.path.getsize(csv_path)
+    parts = _parts(store_dir)
+
+    # Parse new rows with the types of the ingested ones, which a short tail
+    # might otherwise not be inferred as
+    column_types = None
+    if parts:
+        schema = pa.ipc.open_file(pa.memory_map(parts[0], "r")).schema
+        column_types = {f.name: f.type for f in schema if f.name != "reviewed_at"}
+
+    with open(csv_path, "rb") as f:
+        header = f.readline().decode().strip().split(",")
+        tail_line = state.get("tail_line", "").encode()
+        offset = state.get("offset", 0)
+        f.seek(max(offset - len(tail_line) - 2, 0))
+        before_offset = f.read(min(offset, len(tail_line) + 2)).rstrip(b"\r\n")
+        is_append = (
+            bool(tail_line) and offset <= size and before_offset.endswith(tail_line)
+        )
+
+        batches = []
+        f.seek(offset if is_append else 0)
+        if f.read(4096).strip():
+            f.seek(offset if is_append else 0)
+            reader = pa_csv.open_csv(
+                f,
+                read_options=pa_csv.ReadOptions(
+                    block_size=CSV_BLOCK_SIZE,
+                    column_names=header,
+                    skip_rows=0 if is_append else 1,
+                ),
+                convert_options=pa_csv.ConvertOptions(column_types=column_types),
+            )
+            for batch in reader:
+                if "last_id" in state:
+                    batch = batch.filter(pc.greater(batch["id"], state["last_id"]))
+                if batch.num_rows:
+                    batches.append(batch)
+
+        new_tail_line = _last_line(f, size)
+
+    if batches:
+        reviews = pa.Table.from_batches(batches)
+        reviews = reviews.append_column(
+            "reviewed_at", reviews["id"].cast(pa.timestamp("ms"))
+        )
+        path = os.path.join(store_dir, f"part-{len(parts):06d}.arrow")
+        with pa.OSFile(f"{path}.tmp", "wb") as sink:
+            with pa.ipc.new_file(sink, reviews.schema) as writer:
+                writer.write_table(reviews)
+        os.replace(f"{path}.tmp", path)
+        state["last_id"] = max(pc.max(reviews["id"]).as_py(), state.get("last_id", 0))
+        state["version"] = state.get("version", 0) + 1
+
+    state["offset"] = size
+    state["tail_line"] = new_tail_line.decode()
+    with open(os.path.join(store_dir, STATE_FILE), "w") as f:
+        json.dump(state, f)
+
+    return store_dir
+
+
+def read_reviews(store_dir: str = ANKI_DIR) -> pa.Table:
+    """
+    Memory-map all ingested reviews.
+    """
+    tables = [
+        pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        for path in _parts(store_dir)
+    ]
+    return pa.concat_tables(tables, promote=True)
@@ -0,0 +1,167 @@
+"""
+Cold-start benchmark: import time of each page and first render of each figure.
+
+Every measurement runs in a fresh interpreter, as after a machine restart.
+
+    python bench/coldstart.py --save     # record the baseline
+    python bench/coldstart.py            # compare, exit 1 on a regression
+"""
+
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, "bench", "coldstart.json")
+
+# First render of every cached figure on synthetic data, including the lazy
+# imports it triggers
+RENDER_SCRIPT = """
+import datetime, json, sys, time
+import numpy as np, pandas as pd, polars as pl
+from load import Dataset
+from yearindex import year_index
+
+days = pd.date_range(end=datetime.date.today(), periods=3 * 365, freq="D")
+dates = pl.Series(days.to_numpy()).cast(pl.Date)
+values = np.random.default_rng(0).poisson(3, len(days))
+gh_df = pd.DataFrame({"date": days, "value": values})
+gh = Dataset("gh_commits", "bench", gh_df, year_index(gh_df, "date", "value"))
+solve = pl.DataFrame({"Date": dates, "Problems Solved": values})
+solve_ds = Dataset(
+    "solve", "bench", solve, year_index(solve, "Date", "Problems Solved")
+)
+anki_df = pl.DataFrame(
+    {
+        "Date": dates,
+        "Reviews": values * 10,
+        "Graduated Reviews": values * 8,
+        "Passed": values * 7,
+    }
+)
+anki = Dataset("anki", "bench", anki_df, year_index(anki_df, "Date", "Reviews"))
+year = days[-1].year
+
+start = time.perf_counter()
+import charts
+timings = {"import charts": time.perf_counter() - start}
+renders = {
+    "draw_github_calplot": lambda: charts.draw_github_calplot(gh, year=year),
+    "draw_contrib_heatmap": lambda: charts.draw_contrib_heatmap(gh),
+    "draw_solve_calplot": lambda: charts.draw_solve_calplot(solve_ds, year=year),
+    "draw_solve_timecharts": lambda: charts.draw_solve_timecharts(solve_ds),
+    "draw_review_calendar": lambda: charts.draw_review_calendar(anki, year=year),
+    "draw_reviews_per_day": lambda: charts.draw_reviews_per_day(anki, year=year),
+    "draw_retention": lambda: charts.draw_retention(anki, year=year),
+}
+for name, render in renders.items():
+    start = time.perf_counter()
+    render()
+    timings[f"render {name}"] = time.perf_counter() - start
+print(json.dumps(timings))
+"""
+
+
+def page_imports(page: str) -> str:
+    """
+    The module-level import statements of a page, as source.
+    """
+    with open(page) as f:
+        source = f.read()
+    return "\n".join(
+        ast.get_source_segment(source, node)
+        for node in ast.parse(source).body
+        if isinstance(node, (ast.Import, ast.ImportFrom))
+    )
+
+
+def _run(script: str) -> str:
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=ROOT,
+        env={
+            **os.environ,
+            "PYTHONPATH": os.pathsep.join([ROOT, os.environ.get("PYTHONPATH", "")]),
+        },
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        sys.exit(result.stderr)
+    return result.stdout.strip().splitlines()[-1]
+
+
+def measure() -> dict:
+    timings = {}
+    pages = ["01_Home.py"] + sorted(
+        os.path.join("pages", p)
+        for p in os.listdir(os.path.join(ROOT, "pages"))
+        if p.endswith(".py")
+    )
+    for page in pages:
+        imports = page_imports(os.path.join(ROOT, page))
+        script = (
+            "import time\nstart = time.perf_counter()\n"
+            f"{imports}\nprint(time.perf_counter() - start)"
+        )
+        timings[f"import {page}"] = float(_run(script))
+
+    timings.update(json.loads(_run(RENDER_SCRIPT)))
+    return timings
+
+
+def best_of(repeat: int) -> dict:
+    runs = [measure() for _ in range(repeat)]
+    return {name: min(run[name] for run in runs) for name in runs[0]}
+
+
+def compare(timings: dict, baseline: dict, tolerance: float, slack: float) -> list:
+    """
+    Names of the measurements slower than their baseline by more than
+    `tolerance` (relative) plus `slack` seconds.
+    """
+    return [
+        name
+        for name, seconds in timings.items()
+        if name in baseline and seconds > baseline[name] * (1 + tolerance) + slack
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--save", action="store_true", help="record the baseline")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--slack", type=float, default=0.05)
+    args = parser.parse_args()
+
+    timings = best_of(args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    for name, seconds in timings.items():
+        reference = baseline.get(name)
+        reference = "" if reference is None else f"  (baseline {reference:.3f}s)"
+        print(f"{name:<40} {seconds:.3f}s{reference}")
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(timings, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    regressions = compare(timings, baseline, args.tolerance, args.slack)
+    if regressions:
+        print("Cold start regressed:", ", ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Run the app in this process with Deta replaced by synthetic in-memory Bases.
+
+    python bench/fake_app.py --scale 10 -- --server.port=8599
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORK_DIR = tempfile.mkdtemp(prefix="howisjsk-fake-")
+os.environ.setdefault("DETA_MIRROR_DIR", os.path.join(WORK_DIR, "mirror"))
+os.environ.setdefault("SNAPSHOT_DIR", os.path.join(WORK_DIR, "snapshots"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("streamlit_args", nargs="*", help="passed to streamlit run")
+    args = parser.parse_args()
+
+    import datasets
+    import load
+    from synthetic import FakeDeta, generate
+
+    # The pages import the loaders from datasets, which look the client up
+    # there, so they run against the fake from the start
+    fake = FakeDeta(generate(args.scale, args.seed))
+    load.connect_to_deta = datasets.connect_to_deta = lambda: fake
+
+    from streamlit.web import cli
+
+    os.chdir(ROOT)
+    sys.argv = [
+        "streamlit",
+        "run",
+        "01_Home.py",
+        "--server.headless=true",
+        *args.streamlit_args,
+    ]
+    sys.exit(cli.main())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Load test: concurrent sessions rerunning every page over Streamlit's websocket.
+
+Each simulated session opens the app's websocket like a browser tab, visits
+every page and changes its year and color scheme widgets, timing each rerun
+from the BackMsg that triggers it to the ForwardMsg that finishes it. The
+sessions run at the concurrency levels of fly.toml unless given.
+
+    python bench/loadtest.py                      # starts bench/fake_app.py
+    python bench/loadtest.py --url http://localhost:8501 --sessions 1,5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+
+import toml
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from tornado.websocket import websocket_connect
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Widgets changed on every page that has them, by label
+INTERACTIONS = {
+    "Select year in data:": "year",
+    "Select color scheme:": "colorscale",
+}
+
+
+def fly_concurrency() -> list:
+    """
+    Session counts to test: one, and fly.io's soft and hard limits.
+    """
+    with open(os.path.join(ROOT, "fly.toml")) as f:
+        limits = toml.load(f)["services"][0]["concurrency"]
+    return [1, limits["soft_limit"], limits["hard_limit"]]
+
+
+class Session:
+    """
+    A browser tab driving the app through its websocket.
+    """
+
+    def __init__(self, url: str):
+        self.url = url.replace("http", "ws", 1).rstrip("/") + "/_stcore/stream"
+        self.conn = None
+        self.pages = {}  # page name -> page script hash
+        self.widgets = {}  # label -> slider or selectbox proto
+        self.exceptions = []  # messages of exceptions shown by the last run
+
+    async def connect(self):
+        self.conn = await websocket_connect(self.url, max_message_size=2**30)
+
+    def close(self):
+        self.conn.close()
+
+    async def rerun(self, page_script_hash: str = "", widget_states=()) -> float:
+        """
+        Rerun a page and return the seconds until the run finished.
+        """
+        msg = BackMsg()
+        msg.rerun_script.page_script_hash = page_script_hash
+        msg.rerun_script.widget_states.widgets.extend(widget_states)
+
+        self.widgets = {}
+        self.exceptions = []
+        start = time.perf_counter()
+        await self.conn.write_message(msg.SerializeToString(), binary=True)
+        while True:
+            data = await self.conn.read_message()
+            if data is None:
+                raise ConnectionError("websocket closed")
+            fwd = ForwardMsg()
+            fwd.ParseFromString(data)
+            kind = fwd.WhichOneof("type")
+            if kind == "new_session":
+                self.pages = {
+                    p.page_name: p.page_script_hash for p in fwd.new_session.app_pages
+                }
+            elif kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+                element = fwd.delta.new_element
+                element_type = element.WhichOneof("type")
+                if element_type in ("slider", "selectbox"):
+                    widget = getattr(element, element_type)
+                    self.widgets[widget.label] = widget
+                elif element_type == "exception":
+                    self.exceptions.append(element.exception.message)
+            elif kind == "script_finished":
+                return time.perf_counter() - start
+
+    def next_value(self, label: str):
+        """
+        Widget state that moves a slider or selectbox to another value.
+        """
+        widget = self.widgets[label]
+        state = WidgetState(id=widget.id)
+        if widget.DESCRIPTOR.name == "Slider":
+            value = widget.default[0] - widget.step
+            if value < widget.min:
+                value = widget.max
+            state.double_array_value.data.append(value)
+        else:
+            state.int_value = (widget.default + 1) % len(widget.options)
+        return state
+
+
+async def run_session(url: str, rounds: int, latencies: dict, errors: list):
+    session = Session(url)
+
+    async def rerun(page: str, interaction: str, *args):
+        latencies[(page, interaction)].append(await session.rerun(*args))
+        errors.extend(f"{page} {interaction}: {e}" for e in session.exceptions)
+
+    try:
+        await session.connect()
+        await rerun("(new session)", "load")
+        for _ in range(rounds):
+            for page, page_hash in session.pages.items():
+                await rerun(page, "load", page_hash)
+                for label, interaction in INTERACTIONS.items():
+                    if label in session.widgets:
+                        state = session.next_value(label)
+                        await rerun(page, interaction, page_hash, [state])
+    except Exception as e:
+        errors.append(f"session failed: {e!r}")
+    finally:
+        if session.conn is not None:
+            session.close()
+
+
+async def run_level(url: str, sessions: int, rounds: int):
+    latencies = defaultdict(list)
+    errors = []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(run_session(url, rounds, latencies, errors) for _ in range(sessions))
+    )
+    return latencies, errors, time.perf_counter() - start
+
+
+def percentile(values: list, q: float) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def report(sessions: int, latencies: dict, errors: list, elapsed: float):
+    reruns = sum(len(v) for v in latencies.values())
+    print(
+        f"\n{sessions} sessions: {reruns} reruns in {elapsed:.1f}s,"
+        f" {reruns / elapsed:.1f} reruns/s, {len(errors)} errors"
+    )
+    print(f"{'page':<20} {'interaction':<12} {'n':>5} {'p50':>9} {'p95':>9}")
+    for (page, interaction), values in sorted(latencies.items()):
+        print(
+            f"{page:<20} {interaction:<12} {len(values):>5}"
+            f" {percentile(values, 50) * 1000:>7.0f}ms"
+            f" {percentile(values, 95) * 1000:>7.0f}ms"
+        )
+    for error in sorted(set(errors)):
+        print(f"  {errors.count(error)}x {error}")
+
+
+def start_fake_app(port: int, scale: int):
+    app = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(ROOT, "bench", "fake_app.py"),
+            "--scale",
+            str(scale),
+            "--",
+            f"--server.port={port}",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://localhost:{port}"
+    for _ in range(120):
+        try:
+            urllib.request.urlopen(f"{url}/_stcore/health", timeout=1)
+            return app, url
+        except OSError:
+            time.sleep(0.5)
+    app.kill()
+    raise RuntimeError("The fake app did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="test a running app instead of the fake one")
+    parser.add_argument("--port", type=int, default=8599)
+    parser.add_argument("--scale", type=int, default=1, help="fake data scale")
+    parser.add_argument(
+        "--sessions", help="comma-separated session counts (default: fly.toml)"
+    )
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    levels = (
+        [int(n) for n in args.sessions.split(",")]
+        if args.sessions
+        else fly_concurrency()
+    )
+
+    app = None
+    url = args.url
+    if url is None:
+        app, url = start_fake_app(args.port, args.scale)
+    try:
+        for sessions in levels:
+            report(sessions, *asyncio.run(run_level(url, sessions, args.rounds)))
+    finally:
+        if app is not None:
+            app.terminate()
+            app.wait()
+
+
+if __name__ == "__main__":
+    main()
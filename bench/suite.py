@@ -0,0 +1,217 @@
+"""
+Benchmark the dataset loaders, metrics and figure renders on synthetic data.
+
+Deta is replaced by the in-process stand-in of bench/synthetic.py, so the
+suite runs offline. Loaders are timed cold, with an empty mirror and
+snapshot store, and bypass the process caches, as do the renders.
+
+    python bench/suite.py --scales 1,10 --save bench/baseline.json
+    python bench/suite.py --scales 1,10 --compare bench/baseline.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORK_DIR = tempfile.mkdtemp(prefix="howisjsk-bench-")
+os.environ.setdefault("DETA_MIRROR_DIR", os.path.join(WORK_DIR, "mirror"))
+os.environ.setdefault("SNAPSHOT_DIR", os.path.join(WORK_DIR, "snapshots"))
+
+import charts  # noqa: E402
+import datasets  # noqa: E402
+import snapshot  # noqa: E402
+import sync  # noqa: E402
+from synthetic import SCALES, FakeDeta, generate  # noqa: E402
+
+LOADERS = {
+    "load_github_data": lambda: datasets.load_github_data.__wrapped__(),
+    "load_problem_solving_data": (
+        lambda: datasets.load_problem_solving_data.__wrapped__()
+    ),
+    "load_weather_data": lambda: datasets.load_weather_data.__wrapped__(),
+}
+
+
+def _fresh_stores(run: str):
+    """
+    Point the mirror and the snapshot store to empty directories.
+    """
+    sync.MIRROR_DIR = os.path.join(WORK_DIR, run, "mirror")
+    snapshot.SNAPSHOT_DIR = os.path.join(WORK_DIR, run, "snapshots")
+    snapshot._mapped.clear()
+
+
+def _payload(figures) -> int:
+    if isinstance(figures, tuple):
+        return sum(len(f.to_json()) for f in figures)
+    return len(figures.to_json())
+
+
+def _renders(loaded: dict) -> dict:
+    gh, _ = loaded["load_github_data"]
+    solve_ds = loaded["load_problem_solving_data"]
+    year = datetime.date.today().year
+    runs = iter(range(1_000_000))
+
+    def solve_metrics():
+        # A new dataset name per call, so the streaks are computed from
+        # scratch instead of extending the previous call's
+        return charts.solve_metrics(solve_ds._replace(name=f"bench-{next(runs)}"))
+
+    return {
+        "solve_metrics": (solve_metrics, False),
+        "draw_github_calplot": (
+            lambda: charts.draw_github_calplot.__wrapped__(
+                gh, year=year, cmap=charts.GITHUB_CMAP
+            ),
+            True,
+        ),
+        "draw_contrib_heatmap": (
+            lambda: charts.draw_contrib_heatmap.__wrapped__(
+                gh, cmap=charts.GITHUB_CMAP
+            ),
+            True,
+        ),
+        "draw_solve_calplot": (
+            lambda: charts.draw_solve_calplot.__wrapped__(solve_ds, year=year),
+            True,
+        ),
+        "draw_solve_timecharts": (
+            lambda: charts.draw_solve_timecharts.__wrapped__(solve_ds),
+            True,
+        ),
+    }
+
+
+def measure(func, repeat: int, before=None, figure: bool = False) -> tuple:
+    """
+    Best wall time of `repeat` calls after a warm-up call, then the peak
+    memory and the serialized figure size of one more.
+
+    Wall time includes serializing figures, as `figcache.cached_figure` does.
+    Peak memory is traced Python allocations; Arrow buffers are not traced.
+    """
+    wall = float("inf")
+    for i in range(repeat + 1):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        result = func()
+        if figure:
+            _payload(result)
+        if i:
+            wall = min(wall, time.perf_counter() - start)
+
+    if before is not None:
+        before()
+    tracemalloc.start()
+    result = func()
+    payload = _payload(result) if figure else None
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {"wall_s": wall, "peak_bytes": peak, "payload_bytes": payload}
+
+
+def run(scales, seed: int, repeat: int, only: str = None) -> dict:
+    results = {}
+    for scale in scales:
+        fake = FakeDeta(generate(scale, seed))
+        datasets.connect_to_deta = lambda: fake
+
+        loaded = {}
+        for name, loader in LOADERS.items():
+            runs = iter(range(repeat + 2))
+            loaded[name], results[f"{name}@{scale}x"] = measure(
+                loader,
+                repeat,
+                before=lambda: _fresh_stores(f"{scale}x-{name}-{next(runs)}"),
+            )
+            _report(f"{name}@{scale}x", results[f"{name}@{scale}x"])
+
+        for name, (func, figure) in _renders(loaded).items():
+            if only and only not in name:
+                continue
+            _, results[f"{name}@{scale}x"] = measure(func, repeat, figure=figure)
+            _report(f"{name}@{scale}x", results[f"{name}@{scale}x"])
+    return results
+
+
+def _report(name: str, result: dict):
+    payload = result["payload_bytes"]
+    line = (
+        f"{name:<36} {result['wall_s'] * 1000:>10.1f} ms"
+        f" {result['peak_bytes'] / 2**20:>9.1f} MiB"
+        f" {'' if payload is None else f'{payload / 1024:.1f} KiB':>12}"
+    )
+    print(line)
+
+
+def compare(results: dict, baseline: dict, tolerance: float, slack: float) -> list:
+    """
+    Measurements worse than their baseline by more than `tolerance`
+    (relative), plus `slack` seconds for wall times.
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        if result["wall_s"] > reference["wall_s"] * (1 + tolerance) + slack:
+            regressions.append(f"{name} wall time")
+        if result["peak_bytes"] > reference["peak_bytes"] * (1 + tolerance):
+            regressions.append(f"{name} peak memory")
+        if (result["payload_bytes"] or 0) > (reference["payload_bytes"] or 0) * (
+            1 + tolerance
+        ):
+            regressions.append(f"{name} payload")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--scales",
+        default=",".join(str(s) for s in SCALES[:3]),
+        help="comma-separated multiples of the current data sizes, up to 1000",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--only",
+        help="only time the metrics and renders matching this; loaders always run",
+    )
+    parser.add_argument("--save", metavar="PATH", help="save the results as baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare with a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--slack", type=float, default=0.01)
+    args = parser.parse_args()
+
+    scales = [int(s) for s in args.scales.split(",")]
+    print(f"{'function@scale':<36} {'wall':>13} {'peak mem':>13} {'payload':>12}")
+    results = run(scales, args.seed, args.repeat, args.only)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.slack)
+        if regressions:
+            print("Regressions:", *regressions, sep="\n  ")
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Seeded synthetic Deta records and an in-process stand-in for the Deta Base API.
+
+Records are in the wire format of the real Bases (see schemas.py): dates as
+ISO strings and timestamps as epoch seconds. At scale 1 the Bases are about
+their current size; scaling packs more records into the same time span.
+"""
+
+import bisect
+import datetime
+import random
+from typing import NamedTuple
+
+SCALES = (1, 10, 100, 1000)
+
+# Span of the synthetic history, ending today
+DAYS = 3 * 365
+
+
+def gh_commits(scale: int = 1, seed: int = 0) -> list:
+    """
+    Daily contribution counts, one record per repository and day.
+    """
+    rng = random.Random(seed)
+    first_day = datetime.date.today() - datetime.timedelta(days=DAYS - 1)
+    items = []
+    for day in range(DAYS):
+        date = (first_day + datetime.timedelta(days=day)).isoformat()
+        weekend = (first_day + datetime.timedelta(days=day)).weekday() >= 5
+        for repo in range(scale):
+            value = (
+                0 if rng.random() < (0.6 if weekend else 0.3) else rng.randint(1, 12)
+            )
+            items.append({"key": f"{date}-{repo:04d}", "date": date, "value": value})
+    return items
+
+
+def solve(scale: int = 1, seed: int = 0) -> list:
+    """
+    Problem solving events, about three a day at scale 1.
+    """
+    rng = random.Random(seed)
+    end = int(datetime.datetime.now(datetime.timezone.utc).timestamp())
+    start = end - DAYS * 86400
+    items = []
+    for i in range(3 * DAYS * scale):
+        timestamp = rng.randint(start, end)
+        items.append(
+            {
+                "key": f"{timestamp:010d}-{i:08d}",
+                "event": rng.choice(["solve", "attempt"]),
+                "type": rng.choice(["leetcode", "project euler", "codewars"]),
+                "timestamp": timestamp,
+                "value": rng.choice([0, 1, 1, 1, 2, 3]),
+            }
+        )
+    return items
+
+
+def weather(scale: int = 1, seed: int = 0) -> list:
+    """
+    Weather readings, half-hourly over a year at scale 1.
+    """
+    rng = random.Random(seed)
+    step = 1800 / scale
+    end = int(datetime.datetime.now(datetime.timezone.utc).timestamp())
+    count = 365 * 48 * scale
+    items = []
+    temp = 300.0
+    for i in range(count):
+        dt00 = int(end - (count - 1 - i) * step)
+        midnight = dt00 - dt00 % 86400
+        temp = min(max(temp + rng.gauss(0, 0.3), 290.0), 310.0)
+        items.append(
+            {
+                "key": f"{dt00:010d}-{i:09d}",
+                "dt00": dt00,
+                "sunr": midnight - 8 * 3600 + 5 * 3600 + 40 * 60,
+                "suns": midnight - 8 * 3600 + 17 * 3600 + 50 * 60,
+                "city": "Manila",
+                "desc": rng.choice(["clear sky", "few clouds", "light rain"]),
+                "icon": rng.choice(["01d", "02d", "10d"]),
+                "temp": round(temp, 2),
+                "humi": round(rng.uniform(50, 95), 1),
+                "pres": round(rng.uniform(1005, 1015), 1),
+                "wvel": round(rng.uniform(0, 8), 2),
+                "wdeg": rng.randint(0, 359),
+                "cldy": round(rng.uniform(0, 100), 1),
+                "rain": round(max(rng.gauss(0, 1), 0), 2),
+                "p_aqi": rng.randint(1, 5),
+            }
+        )
+    return items
+
+
+GENERATORS = {"gh_commits": gh_commits, "solve": solve, "weather": weather}
+
+
+def generate(scale: int = 1, seed: int = 0) -> dict:
+    """
+    Records of every Base at `scale`.
+    """
+    return {name: gen(scale, seed) for name, gen in GENERATORS.items()}
+
+
+# ----------------------------
+# In-process Deta Base stand-in
+
+
+class FetchResponse(NamedTuple):
+    items: list
+    last: str
+    count: int
+
+
+def _matches(item: dict, query: dict) -> bool:
+    for condition, value in query.items():
+        field, _, op = condition.partition("?")
+        x = item.get(field)
+        if op == "gte" and not x >= value:
+            return False
+        if op == "lte" and not x <= value:
+            return False
+        if op == "r" and not value[0] <= x <= value[1]:
+            return False
+        if op == "" and x != value:
+            return False
+    return True
+
+
+class FakeBase:
+    """
+    A Deta Base kept in memory, with key-ordered paging like the real one and
+    the `?gte`, `?lte` and `?r` query operators.
+    """
+
+    def __init__(self, items: list, name: str = "fake"):
+        self.name = name
+        self._items = sorted(items, key=lambda item: item["key"])
+        self._keys = [item["key"] for item in self._items]
+
+    def put(self, item: dict):
+        i = bisect.bisect_left(self._keys, item["key"])
+        if i < len(self._keys) and self._keys[i] == item["key"]:
+            self._items[i] = item
+        else:
+            self._keys.insert(i, item["key"])
+            self._items.insert(i, item)
+
+    def fetch(self, query=None, limit: int = 1000, last: str = None):
+        queries = query if isinstance(query, list) else [query or {}]
+        start = 0 if last is None else bisect.bisect_right(self._keys, last)
+        items = []
+        for i in range(start, len(self._items)):
+            item = self._items[i]
+            if any(_matches(item, q) for q in queries):
+                if len(items) == limit:
+                    return FetchResponse(items, items[-1]["key"], len(items))
+                items.append(item)
+        return FetchResponse(items, None, len(items))
+
+
+class FakeDeta:
+    """
+    Stand-in for `deta.Deta` serving synthetic Bases.
+    """
+
+    def __init__(self, bases: dict):
+        self.bases = {name: FakeBase(items, name) for name, items in bases.items()}
+
+    def Base(self, name: str) -> FakeBase:
+        return self.bases.setdefault(name, FakeBase([], name))
@@ -0,0 +1,28 @@
+import os
+import sys
+
+# ----------------------------
+# Boot hook: warm the caches, then start Streamlit in this process
+
+# The Streamlit server only starts listening once every page's datasets and
+# default figures are loaded (or after WARM_TIMEOUT seconds), so the health
+# check passes only then. Warming runs in the server's process because the
+# dataset and figure caches are per process.
+WARM_TIMEOUT = float(os.environ.get("WARM_TIMEOUT", 120))
+
+
+def main():
+    from prefetch import PREFETCH, prefetch_pages
+
+    prefetch_pages()
+    if not PREFETCH.wait(WARM_TIMEOUT):
+        print(f"Caches still warming after {WARM_TIMEOUT}s, starting anyway")
+
+    from streamlit.web import cli
+
+    sys.argv = ["streamlit", "run", *sys.argv[1:]]
+    sys.exit(cli.main())
+
+
+if __name__ == "__main__":
+    main()
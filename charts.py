@@ -0,0 +1,377 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import polars as pl
+from downsample import (
+    LEADERBOARD_TOP_K,
+    POINT_BUDGET,
+    downsample_line,
+    scatter_trace,
+    top_k,
+)
+from figcache import cached_figure
+from lazy import lazy_import
+from load import Dataset
+from metrics import instrument
+from streaks import streak_info
+from yearindex import YearIndex
+
+# matplotlib is only needed for the static calendar, and plotly_calplot only
+# once a calendar is drawn
+calplot = lazy_import("calplot")
+plotly_calplot = lazy_import("plotly_calplot")
+
+# ----------------------------
+# GitHub Contributions
+
+GITHUB_CMAP = "ylgn"
+
+
+@instrument("render")
+def draw_calplot(
+    ds: pd.Series, year: int = None, cmap: str = "YlGn", index: YearIndex = None
+):
+    """
+    Draw a static calendar of daily values. `index` is the year index of
+    `ds`, e.g. the one of the GitHub dataset `ds` is loaded with.
+    """
+    vmax = None
+    if index is not None:
+        ds = index.take(ds, year)
+        vmax = index.max(year)
+    elif year is not None:
+        ds = ds.loc[ds.index.year == year]
+    if year is not None:
+        year_labels = False
+        title = f"GitHub Contributions in {year}"
+    else:
+        year_labels = True
+        title = "GitHub Contributions"
+    fig, ax = calplot.calplot(
+        ds,
+        how="sum",
+        yearascending=False,
+        cmap=cmap,
+        edgecolor="white",
+        linewidth=0.5,
+        yearlabels=year_labels,
+        suptitle=title,
+        vmax=vmax,
+    )
+    return fig
+
+
+@cached_figure
+def draw_github_calplot(gh: Dataset, year: int = None, cmap: str = "YlGn"):
+    df = gh.year(year)
+    if year is not None:
+        total_height = 200
+        title = f"GitHub Contributions in {year}"
+        years_title = False
+    else:
+        total_height = None
+        title = "GitHub Contributions"
+        years_title = True
+
+    fig = plotly_calplot.calplot(
+        df,
+        x="date",
+        y="value",
+        colorscale=cmap,
+        total_height=total_height,
+        title=title,
+        years_title=years_title,
+        name="Contributions",
+    )
+
+    return fig
+
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+MONTHS = [
+    "Jan",
+    "Feb",
+    "Mar",
+    "Apr",
+    "May",
+    "Jun",
+    "Jul",
+    "Aug",
+    "Sep",
+    "Oct",
+    "Nov",
+    "Dec",
+]
+
+
+def contrib_heatmap_matrix(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Mean contributions per weekday (rows, Sunday first) and month (columns).
+    """
+    cells = df["date"].dt.weekday.to_numpy() * 12 + df["date"].dt.month.to_numpy() - 1
+    sums = np.bincount(cells, weights=df["value"].to_numpy(), minlength=7 * 12)
+    counts = np.bincount(cells, minlength=7 * 12)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = (sums / counts).reshape(7, 12)
+
+    matrix = pd.DataFrame(
+        means,
+        index=pd.CategoricalIndex(WEEKDAYS, categories=WEEKDAYS, name="weekday"),
+        columns=pd.CategoricalIndex(MONTHS, categories=MONTHS, name="month"),
+    )
+    return matrix.iloc[[6, 0, 1, 2, 3, 4, 5]]
+
+
+@cached_figure
+def draw_contrib_heatmap(gh: Dataset, cmap: str = "YlGn"):
+    matrix = contrib_heatmap_matrix(gh.frame)
+
+    fig = go.Figure(
+        go.Heatmap(
+            z=matrix.to_numpy(),
+            x=list(matrix.columns),
+            y=list(matrix.index),
+            colorscale=cmap,
+            colorbar=dict(title="Mean Contribution"),
+            hovertemplate="Month: %{x}<br>Day of the Week: %{y}<br>Mean Contribution: %{z}<extra></extra>",
+            hoverlabel=dict(bgcolor="white", font_size=16, font_family="sans-serif"),
+        )
+    )
+
+    fig.update_layout(
+        title="GitHub Contributions Heatmap",
+        xaxis_title="Month",
+        yaxis_title="Day of the Week",
+        font=dict(family="Atkinson Hyperlegible, sans-serif", size=18, color="#7f7f7f"),
+    )
+
+    return fig
+
+
+# ----------------------------
+# Problem Solving
+
+
+@cached_figure
+def draw_solve_calplot(solve_ds: Dataset, year: int = None):
+    df = solve_ds.year(year)
+    if year is not None:
+        total_height = 200
+        title = f"Problems Solved in {year}"
+        years_title = False
+    else:
+        total_height = None
+        title = "Problems Solved"
+        years_title = True
+
+    # plotly_calplot only takes pandas; this is the page's one conversion,
+    # of the selected year only
+    fig = plotly_calplot.calplot(
+        df.to_pandas(),
+        x="Date",
+        y="Problems Solved",
+        # colorscale=cmap,
+        total_height=total_height,
+        title=title,
+        years_title=years_title,
+        name="Problems Solved",
+    )
+
+    return fig
+
+
+@cached_figure
+def draw_solve_timecharts(
+    solve_ds: Dataset,
+    select_year: int = None,
+    max_points: int = POINT_BUDGET,
+    k: int = LEADERBOARD_TOP_K,
+):
+    """
+    Draw the leaderboard of the `k` best days and the timeline, with at most
+    `max_points` points.
+    """
+    df = solve_ds.year(select_year)
+    # Plotly serializes NumPy arrays as they are, and polars hands out its
+    # numeric columns without copying them
+    dates = df["Date"].to_numpy()
+    solved = df["Problems Solved"].to_numpy()
+    hovertemplate = "Date=%{x}<br>Problems Solved=%{y}<extra></extra>"
+
+    line_dates, line_solved = downsample_line(dates, solved, max_points)
+    fig_timeline = go.Figure(
+        scatter_trace(len(dates))(
+            x=line_dates,
+            y=line_solved,
+            mode="lines",
+            fill="tozeroy",
+            hovertemplate=hovertemplate,
+        )
+    )
+    fig_timeline.update_layout(
+        title="Timeline", xaxis_title="Date", yaxis_title="Problems Solved"
+    )
+
+    best = top_k(solved, k)
+    fig_leaderboard = go.Figure(
+        go.Bar(
+            x=solved[best],
+            y=dates[best],
+            orientation="h",
+            marker={"color": solved[best], "coloraxis": "coloraxis"},
+            hovertemplate="Problems Solved=%{x}<br>Date=%{y}<extra></extra>",
+        )
+    )
+    fig_leaderboard.update_layout(
+        xaxis_title="Problems Solved",
+        yaxis_title="Date",
+        yaxis_type="category",
+        yaxis={"categoryorder": "total ascending"},
+        coloraxis_colorbar_title="Problems Solved",
+        title=(
+            f"Leaderboard: Top {len(best)} Days"
+            if len(best) < len(solved)
+            else "Leaderboard"
+        ),
+    )
+
+    return fig_leaderboard, fig_timeline
+
+
+def solve_metrics(solve_ds: Dataset, count_null_streak: bool = False):
+    df = solve_ds.frame
+    total_solved = solve_ds.index.total()
+    avg_solve_perday = round(df["Problems Solved"].mean(), 2)
+
+    streaks = streak_info(
+        df,
+        "Date",
+        ["Problems Solved"],
+        key=solve_ds.name,
+        count_null_streak=count_null_streak,
+    )["Problems Solved"]
+
+    return (
+        total_solved,
+        avg_solve_perday,
+        streaks.longest,
+        streaks.current,
+        streaks.intervals,
+    )
+
+
+# ----------------------------
+# Weather
+
+# Field -> (label, scale, offset) to show a rollup field in the page's units
+WEATHER_FIELDS = {
+    "temp": ("Temperature (°C)", 1, -273.15),
+    "humi": ("Humidity (%)", 100, 0),
+    "pres": ("Pressure (hPa)", 1, 0),
+    "wvel": ("Wind Speed (kph)", 3.6, 0),
+    "rain": ("Rainfall (mm)", 1, 0),
+    "cldy": ("Cloudiness (%)", 100, 0),
+    "p_aqi": ("Air Quality Index", 1, 0),
+}
+
+
+@cached_figure
+def draw_weather_history(history: Dataset, field: str = "temp"):
+    """
+    Draw the mean of a field over the history's buckets, within a band from
+    their minimum to their maximum.
+    """
+    label, scale, offset = WEATHER_FIELDS[field]
+    buckets = history.frame["bucket"].to_numpy()
+    low, mean, high = (
+        history.frame[f"{field}_{stat}"].to_numpy() * scale + offset
+        for stat in ("min", "mean", "max")
+    )
+    resolution = history.name.rpartition("_")[2]
+    trace = scatter_trace(len(buckets))
+
+    fig = go.Figure(
+        [
+            trace(x=buckets, y=high, mode="lines", line_width=0, name="Max"),
+            trace(
+                x=buckets,
+                y=low,
+                mode="lines",
+                line_width=0,
+                fill="tonexty",
+                name="Min",
+            ),
+            trace(x=buckets, y=mean, mode="lines", name="Mean"),
+        ]
+    )
+    fig.update_layout(
+        title=f"{label.split(' (')[0]} per {resolution}",
+        xaxis_title="Date",
+        yaxis_title=label,
+        hovermode="x unified",
+    )
+    return fig
+
+
+# ----------------------------
+# Anki
+
+
+@cached_figure
+def draw_reviews_per_day(anki: Dataset, year: int = None):
+    df = anki.year(year).to_pandas(date_as_object=False)
+    fig = px.bar(df, x="Date", y="Reviews")
+    fig.update_layout(title="Reviews per Day")
+    return fig
+
+
+@cached_figure
+def draw_retention(anki: Dataset, year: int = None):
+    df = (
+        anki.year(year)
+        .groupby(pl.col("Date").dt.truncate("1mo").alias("Month"))
+        .agg([pl.col("Passed").sum(), pl.col("Graduated Reviews").sum()])
+        .filter(pl.col("Graduated Reviews") > 0)
+        .with_columns(
+            (100 * pl.col("Passed") / pl.col("Graduated Reviews")).alias(
+                "Retention (%)"
+            )
+        )
+        .sort("Month")
+        .to_pandas(date_as_object=False)
+    )
+    fig = px.line(df, x="Month", y="Retention (%)", markers=True)
+    fig.update_layout(title="Monthly Retention")
+    return fig
+
+
+@cached_figure
+def draw_review_calendar(anki: Dataset, year: int = None):
+    df = anki.year(year).to_pandas(date_as_object=False)
+    if year is not None:
+        total_height = 200
+        title = f"Reviews in {year}"
+        years_title = False
+    else:
+        total_height = None
+        title = "Reviews"
+        years_title = True
+
+    fig = plotly_calplot.calplot(
+        df,
+        x="Date",
+        y="Reviews",
+        total_height=total_height,
+        title=title,
+        years_title=years_title,
+        name="Reviews",
+    )
+    return fig
+
+
+def anki_years(anki: Dataset) -> list:
+    """
+    Years with reviews, oldest first.
+    """
+    return anki.index.years
@@ -0,0 +1,161 @@
+import datetime
+import functools
+
+import pandas as pd
+import polars as pl
+import pyarrow as pa
+import pytz
+from anki import read_reviews
+from load import Dataset, connect_to_deta, stale_while_revalidate
+from metrics import instrument
+from rollup import pick_resolution, read_rollup, read_state
+from snapshot import mirror_lock, shared_base, shared_window, snapshot_version
+from sync import update_mirror
+from yearindex import year_index
+
+# ----------------------------
+# Dataset loaders shared by the pages and the boot-time warmer
+
+
+def _github_daily(contributions: pa.Table) -> pa.Table:
+    # Sorted by date for the year index
+    return contributions.select(["date", "value"]).sort_by("date")
+
+
+@stale_while_revalidate(ttl=43200)
+@instrument("load")
+def load_github_data() -> tuple[Dataset, pd.Series]:
+    """
+    Load GitHub Contributions data from Deta.
+
+    The sorted contributions are shared between processes as a snapshot;
+    the pandas frame converted from them is per process.
+    """
+    # Load GitHub Contributions data from Deta
+    deta = connect_to_deta()
+    contributions = shared_base(
+        deta, "gh_commits", max_age=43200, derive=_github_daily, name="gh_daily"
+    )
+    version = snapshot_version(contributions)
+
+    # Convert to Pandas DataFrame
+    df = contributions.to_pandas(date_as_object=False)
+
+    # Convert to Pandas Series, in the same order so the index applies to it
+    ds = pd.Series(df["value"].to_numpy(), index=pd.DatetimeIndex(df["date"]))
+
+    index = year_index(df, "date", "value")
+    return (Dataset("gh_commits", version, df, index), ds)
+
+
+def _solve_daily(problem_solving: pa.Table) -> pa.Table:
+    df = pl.from_arrow(problem_solving.select(["timestamp", "value"]))
+    df = df.sort("timestamp")
+
+    df = df.with_columns(
+        [
+            pl.col("timestamp").dt.truncate("1d").cast(pl.Date).alias("Date"),
+            pl.col("value").alias("Problems Solved"),
+        ]
+    )
+    df = df.groupby("Date", maintain_order=True).agg(pl.col("Problems Solved").sum())
+    return df.to_arrow()
+
+
+@stale_while_revalidate(ttl=43200)
+@instrument("load")
+def load_problem_solving_data() -> Dataset:
+    """
+    Load Problem Solving data from Deta.
+
+    The daily totals are shared between processes as a snapshot, and stay in
+    polars on its memory-mapped buffers; the charts convert what they draw
+    themselves.
+    """
+    # Load Problem Solving data from Deta
+    deta = connect_to_deta()
+    problem_solving = shared_base(
+        deta, "solve", max_age=43200, derive=_solve_daily, name="solve_daily"
+    )
+    version = snapshot_version(problem_solving)
+
+    df = pl.from_arrow(problem_solving)
+    return Dataset("solve", version, df, year_index(df, "Date", "Problems Solved"))
+
+
+@stale_while_revalidate(ttl=1800)
+@instrument("load")
+def load_weather_data(latest: int = 49) -> pd.DataFrame:
+    """
+    Load the latest Weather data from Deta.
+
+    The default covers the last 24 hours of half-hourly readings, which is
+    all the current weather panel needs.
+    """
+    # Load Weather data from Deta
+    deta = connect_to_deta()
+    weather = shared_window(deta, "weather", latest, max_age=1800).drop(["key"])
+
+    df = weather.to_pandas()
+    df["date"] = df["dt00"].dt.tz_convert(pytz.timezone("Asia/Manila"))
+    df.reset_index(drop=True, inplace=True)
+    # df = df.set_index("date")
+
+    return df
+
+
+def load_weather_history(start: datetime.date, end: datetime.date) -> Dataset:
+    """
+    Load the Weather history between two days from its rollups, at the
+    finest resolution that keeps it under `rollup.MAX_ROWS` buckets.
+    """
+    if "version" not in read_state():
+        # Nothing is rolled up before the readings are first mirrored
+        with mirror_lock("weather"):
+            update_mirror(connect_to_deta(), "weather")
+
+    return _weather_history(read_state().get("version"), start, end)
+
+
+# Date ranges of the Weather history kept per process
+WEATHER_HISTORY_CACHE_SIZE = 32
+
+
+@functools.lru_cache(maxsize=WEATHER_HISTORY_CACHE_SIZE)
+@instrument("load", "load_weather_history")
+def _weather_history(version: int, start: datetime.date, end: datetime.date):
+    first = datetime.datetime.combine(start, datetime.time.min)
+    last = datetime.datetime.combine(end, datetime.time.max)
+    resolution = pick_resolution(first, last)
+    df = read_rollup(resolution, first, last)
+
+    # The range is part of the version, so that every range is drawn apart
+    return Dataset(f"weather_{resolution}", f"{version}:{start}:{end}", df)
+
+
+@functools.lru_cache(maxsize=1)
+@instrument("load")
+def load_anki_data(version: int) -> Dataset:
+    """
+    Aggregate the memory-mapped Anki review log per day.
+
+    Cached per process, including outside of a script run, so the boot-time
+    warmer's result is what the page is served.
+
+    `ease` is the answer button (1 is "Again") and `type` 1 marks reviews of
+    graduated cards, which retention is measured on.
+    """
+    reviews = pl.from_arrow(read_reviews())
+    is_review = pl.col("type") == 1
+    df = (
+        reviews.groupby(pl.col("reviewed_at").cast(pl.Date).alias("Date"))
+        .agg(
+            [
+                pl.count().alias("Reviews"),
+                is_review.sum().alias("Graduated Reviews"),
+                (is_review & (pl.col("ease") > 1)).sum().alias("Passed"),
+            ]
+        )
+        .sort("Date")
+    )
+    return Dataset("anki", str(version), df, year_index(df, "Date", "Reviews"))
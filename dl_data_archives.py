@@ -1,13 +1,23 @@
 import base64
 import datetime
+import json
 import os
 import re
-import urllib.request
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import unquote
 
 import py7zr
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 import requests
 import streamlit as st
+from anki import ingest_anki_csv
+from webhistory import DOMAIN_PATTERN, WEBHISTORY_DATASET
 
 
 def create_onedrive_directdownload(onedrive_link):
@@ -21,49 +31,120 @@ def create_onedrive_directdownload(onedrive_link):
     return resultUrl
 
 
-def get_link_file_size(direct_file_link):
-    req = urllib.request.Request(direct_file_link, method="HEAD")
-    f = urllib.request.urlopen(req)
-    if f.status == 200:
-        file_size = float(f.headers["Content-Length"])
-        file_size = round(file_size / 1000000, 2)  # Change from bytes to megabytes
-    else:
-        file_size = None
-    return file_size
+CHUNK_SIZE = 1024 * 1024
+CSV_BLOCK_SIZE = 16 * 1024 * 1024
+# Rows per row group of a partition sorted by domain, so that a filter on
+# the domain skips the row groups whose min/max statistics exclude it
+ROW_GROUP_ROWS = 4096
+STATE_FILE = ".downloads.json"
+
+_session = requests.Session()
+_state_lock = threading.Lock()
+
+
+def _read_state(destination: str) -> dict:
+    try:
+        with open(os.path.join(destination, STATE_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def update_download_state(destination: str, url: str, **entry):
+    """
+    Record validators and paths of a download in the destination folder.
+    """
+    with _state_lock:
+        state = _read_state(destination)
+        state.setdefault(url, {}).update(entry)
+        with open(os.path.join(destination, STATE_FILE), "w") as f:
+            json.dump(state, f, indent=2)
+
+
+def _response_filename(response) -> str:
+    filename = unquote((response.headers["Content-Disposition"].split("''"))[-1])
+    return re.search('filename="(.*?)"', filename).group(1)
 
 
 def download(url: str, dest_folder: str):
+    """
+    Download a file into a folder, returning its path and size in MB.
+
+    The ETag/Last-Modified of the last download are sent along, and if the
+    file did not change since, nothing is downloaded and None is returned as
+    the path. An interrupted download is resumed with an HTTP Range request.
+    Raises `requests.HTTPError` if the download fails.
+    """
     destination = os.path.join(os.getcwd(), dest_folder)
     if not os.path.exists(destination):
         os.makedirs(destination)  # create folder if it does not exist
 
-    req = urllib.request.Request(url, method="HEAD")
-    f = urllib.request.urlopen(req)
-    filename = unquote((f.headers["Content-Disposition"].split("''"))[-1])
+    entry = _read_state(destination).get(url, {})
+    validator = entry.get("etag") or entry.get("last_modified")
+    part_path = os.path.join(destination, f".{entry.get('filename')}.part")
+    headers = {}
+    if entry.get("complete") and os.path.exists(entry.get("output", "")):
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    elif not entry.get("complete") and validator and os.path.exists(part_path):
+        headers["Range"] = f"bytes={os.path.getsize(part_path)}-"
+        headers["If-Range"] = validator
 
-    filename = re.search('filename="(.*?)"', filename).group(1)
+    r = _session.get(url, stream=True, headers=headers, timeout=60)
+    if r.status_code == 304:
+        print(f"Not modified since the last download:\n> {entry['output']}")
+        return None, entry.get("size")
+    if r.status_code == 416 and "Range" in headers:
+        # The part file is already whole, e.g. after a crash before it was
+        # renamed: finish it, or start over if it does not match the file.
+        r.close()
+        total = r.headers.get("Content-Range", "").rsplit("/", 1)[-1]
+        if total.isdigit() and int(total) == os.path.getsize(part_path):
+            file_path = os.path.join(destination, entry["filename"])
+            os.replace(part_path, file_path)
+            update_download_state(destination, url, complete=True, output=file_path)
+            return file_path, entry.get("size")
+        os.remove(part_path)
+        return download(url, destination)
+    r.raise_for_status()  # HTTP status code 4XX/5XX
+
+    filename = _response_filename(r)
     file_path = os.path.join(destination, filename)
+    part_path = os.path.join(destination, f".{filename}.part")
+    if r.status_code == 206:
+        file_size = int(r.headers["Content-Range"].rsplit("/", 1)[-1])
+        mode = "ab"
+    else:
+        file_size = int(r.headers.get("Content-Length", 0))
+        mode = "wb"
+    file_size = round(file_size / 1000000, 2)  # Change from bytes to megabytes
+
+    update_download_state(
+        destination,
+        url,
+        etag=r.headers.get("ETag"),
+        last_modified=r.headers.get("Last-Modified"),
+        filename=filename,
+        size=file_size,
+        complete=False,
+    )
 
-    if os.path.exists(file_path):
-        # Delete the file if it already exists
-        os.remove(file_path)
+    print(
+        f'\n({datetime.datetime.now().strftime("%H:%M:%S")})',
+        "Saving to:\n> ",
+        os.path.abspath(file_path),
+    )
+    with open(part_path, mode, buffering=CHUNK_SIZE) as f:
+        for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+            f.write(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(part_path, file_path)
 
-    r = requests.get(url, stream=True)
-    if r.ok:
-        print(
-            f'\n({datetime.datetime.now().strftime("%H:%M:%S")})',
-            "Saving to:\n> ",
-            os.path.abspath(file_path),
-        )
-        with open(file_path, "wb") as f:
-            for chunk in r.iter_content(chunk_size=1024 * 8):
-                if chunk:
-                    f.write(chunk)
-                    f.flush()
-                    os.fsync(f.fileno())
-    else:  # HTTP status code 4XX/5XX
-        print("Download failed: status code {}\n{}".format(r.status_code, r.text))
-    return file_path
+    update_download_state(destination, url, complete=True, output=file_path)
+    return file_path, file_size
 
 
 def download_onedrive_file(onedrive_link, dest_folder: str = None):
@@ -74,9 +155,7 @@ def download_onedrive_file(onedrive_link, dest_folder: str = None):
             os.path.dirname(os.path.abspath(__file__)), dest_folder
         )
     direct_file_link = create_onedrive_directdownload(onedrive_link)
-    file_size = get_link_file_size(direct_file_link)
-    file_path = download(direct_file_link, destination)
-    return file_path, file_size
+    return download(direct_file_link, destination)
 
 
 def extract_7z_file(archive_path: str):
@@ -84,8 +163,150 @@ def extract_7z_file(archive_path: str):
         archive.extractall(os.path.dirname(archive_path))
 
 
-def dl_csv_archive(onedrive_link: str, dest_folder: str = "tmp"):
-    csv_7z, csv_7z_size = download_onedrive_file(onedrive_link, dest_folder)
+def _open_csv(csv_path: str, column_types: dict = None):
+    return pa_csv.open_csv(
+        csv_path,
+        read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+        convert_options=pa_csv.ConvertOptions(column_types=column_types or {}),
+    )
+
+
+def _sort_partitions(dataset_dir: str, date_column: str):
+    """
+    Rewrite every partition of a dataset as one file sorted by domain and
+    date, one partition in memory at a time.
+    """
+    for directory, _, files in os.walk(dataset_dir):
+        files = [os.path.join(directory, f) for f in files if f.endswith(".parquet")]
+        if not files:
+            continue
+        table = ds.dataset(files, format="parquet").to_table()
+        table = table.sort_by([("domain", "ascending"), (date_column, "ascending")])
+        sorted_path = os.path.join(directory, "sorted.parquet.tmp")
+        pq.write_table(
+            table,
+            sorted_path,
+            row_group_size=ROW_GROUP_ROWS,
+            compression="zstd",
+            use_dictionary=True,
+        )
+        for path in files:
+            os.remove(path)
+        os.replace(sorted_path, os.path.join(directory, "part-0.parquet"))
+
+
+def csv_to_parquet(
+    csv_path: str,
+    dataset_dir: str,
+    date_column: str = None,
+    epoch_unit: str = None,
+    with_domain: bool = False,
+):
+    """
+    Convert a CSV file into a Parquet dataset partitioned by the year and month
+    of `date_column`, reading the CSV in blocks.
+
+    `date_column` defaults to the first column read as a date or timestamp.
+    With `epoch_unit` (e.g. "ms"), the column holds integer epoch times.
+    Every other column is read as strings: types are only inferred from the
+    first block, so a column empty there would fail on its first value after
+    it. String columns are dictionary-encoded and the files zstd-compressed.
+
+    With `with_domain`, a `domain` column holds the host of the first column
+    named like "url", and every partition is sorted by it in small row
+    groups, so that readers filtering on a domain skip most of each file.
+    """
+    inferred = _open_csv(csv_path).schema
+    if date_column is None:
+        date_column = next(
+            (
+                field.name
+                for field in inferred
+                if pa.types.is_timestamp(field.type) or pa.types.is_date(field.type)
+            ),
+            None,
+        )
+        if date_column is None:
+            raise ValueError(f"No date or timestamp column in {csv_path}")
+    column_types = {field.name: pa.string() for field in inferred}
+    column_types[date_column] = (
+        pa.int64() if epoch_unit is not None else inferred.field(date_column).type
+    )
+    reader = _open_csv(csv_path, column_types)
+    url_column = None
+    if with_domain:
+        url_column = next(name for name in reader.schema.names if "url" in name.lower())
+
+    partition_schema = pa.schema([("year", pa.int16()), ("month", pa.int8())])
+    columns = list(reader.schema)
+    if url_column is not None:
+        columns.append(pa.field("domain", pa.string()))
+    schema = pa.schema(columns + list(partition_schema))
+    errors = []
+
+    def batches():
+        # An exception raised into write_dataset's threads aborts the
+        # interpreter, so it is kept and raised once the writer is done.
+        try:
+            for batch in reader:
+                dates = batch[date_column]
+                if epoch_unit is not None:
+                    dates = dates.cast(pa.timestamp(epoch_unit))
+                extra = []
+                if url_column is not None:
+                    hosts = pc.extract_regex(batch[url_column], DOMAIN_PATTERN)
+                    extra.append(hosts.flatten()[0])
+                yield pa.RecordBatch.from_arrays(
+                    batch.columns
+                    + extra
+                    + [
+                        pc.year(dates).cast(pa.int16()),
+                        pc.month(dates).cast(pa.int8()),
+                    ],
+                    schema=schema,
+                )
+        except Exception as e:
+            errors.append(e)
+
+    tmp_dir = f"{dataset_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    ds.write_dataset(
+        batches(),
+        tmp_dir,
+        schema=schema,
+        format="parquet",
+        partitioning=ds.partitioning(partition_schema, flavor="hive"),
+        file_options=ds.ParquetFileFormat().make_write_options(
+            compression="zstd", use_dictionary=True
+        ),
+        max_partitions=4096,
+    )
+    if errors:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise errors[0]
+    if url_column is not None:
+        _sort_partitions(tmp_dir, date_column)
+
+    shutil.rmtree(dataset_dir, ignore_errors=True)
+    os.replace(tmp_dir, dataset_dir)
+    return dataset_dir
+
+
+def dl_csv_archive(onedrive_link: str, dest_folder: str = "tmp", convert=None):
+    """
+    Download and extract a 7z archive holding a CSV file.
+
+    With `convert`, the CSV is passed to it and deleted, and the path it
+    returns (e.g. a Parquet dataset, see `csv_to_parquet`) is returned instead
+    of the CSV.
+    """
+    destination = os.path.join(os.path.dirname(os.path.abspath(__file__)), dest_folder)
+    direct_file_link = create_onedrive_directdownload(onedrive_link)
+    csv_7z, csv_7z_size = download(direct_file_link, destination)
+    if csv_7z is None:
+        # Unchanged since the last download, keep its output
+        return _read_state(destination).get(direct_file_link, {}).get("output")
+
     print(f"Downloaded {csv_7z_size} MB for the current archive.")
     extract_7z_file(csv_7z)
     csv_file = csv_7z[:-3]
@@ -94,7 +315,18 @@ def dl_csv_archive(onedrive_link: str, dest_folder: str = "tmp"):
         f"Extracted CSV file:\n> '{csv_file}'",
     )
     os.remove(csv_7z)
-    return csv_file
+
+    output = csv_file
+    if convert is not None:
+        output = convert(csv_file)
+        os.remove(csv_file)
+        print(
+            f'({datetime.datetime.now().strftime("%H:%M:%S")})',
+            f"Converted to:\n> '{output}'",
+        )
+
+    update_download_state(destination, direct_file_link, output=output)
+    return output
 
 
 def get_env_var(VAR_NAME: str, from_env: bool = False):
@@ -112,16 +344,30 @@ def main():
     anki_link = get_env_var("ANKI_URL")
     webhistory_link = get_env_var("WEBHISTORY_URL")
 
-    csv_webhistory = dl_csv_archive(
-        onedrive_link=webhistory_link,
-        dest_folder="assets",
-    )
-    csv_anki_stats = dl_csv_archive(
-        onedrive_link=anki_link,
-        dest_folder="assets",
+    webhistory_dir = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "assets", WEBHISTORY_DATASET
     )
 
-    return csv_webhistory, csv_anki_stats
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        webhistory_job = pool.submit(
+            dl_csv_archive,
+            onedrive_link=webhistory_link,
+            dest_folder="assets",
+            convert=lambda csv_file: csv_to_parquet(
+                csv_file, webhistory_dir, with_domain=True
+            ),
+        )
+        # Only the reviews past the last ingested one are parsed
+        anki_job = pool.submit(
+            dl_csv_archive,
+            onedrive_link=anki_link,
+            dest_folder="assets",
+            convert=ingest_anki_csv,
+        )
+        webhistory_dataset = webhistory_job.result()
+        anki_store = anki_job.result()
+
+    return webhistory_dataset, anki_store
 
 
 if __name__ == "__main__":
@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+import plotly.graph_objects as go
+
+# ----------------------------
+# Downsampling of long series before they are sent to the browser
+
+# Most points a line chart is drawn with, bars a leaderboard shows, and
+# points of a series (before it is downsampled) above which its traces are
+# drawn with WebGL instead of SVG
+POINT_BUDGET = int(os.environ.get("CHART_POINT_BUDGET", 2000))
+LEADERBOARD_TOP_K = int(os.environ.get("LEADERBOARD_TOP_K", 30))
+WEBGL_THRESHOLD = int(os.environ.get("WEBGL_THRESHOLD", 5000))
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Indices of the `n_out` points of a line that keep its shape, by
+    Largest-Triangle-Three-Buckets.
+
+    The first and last points are kept. The points in between are split into
+    `n_out - 2` buckets, and from each the point forming the largest triangle
+    with the point kept from the previous bucket and the mean of the next one
+    is kept. `x` must be sorted; dates are compared as numbers.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = x.astype("int64") if np.issubdtype(x.dtype, np.datetime64) else x
+    x = x.astype("float64")
+    y = y.astype("float64")
+
+    every = (n - 2) / (n_out - 2)
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start = int(i * every) + 1
+        stop = int((i + 1) * every) + 1
+        next_stop = min(int((i + 2) * every) + 1, n)
+        next_x = x[stop:next_stop].mean()
+        next_y = y[stop:next_stop].mean()
+
+        areas = np.abs(
+            (x[a] - next_x) * (y[start:stop] - y[a])
+            - (x[a] - x[start:stop]) * (next_y - y[a])
+        )
+        a = start + int(areas.argmax())
+        kept[i + 1] = a
+    return kept
+
+
+def downsample_line(x: np.ndarray, y: np.ndarray, max_points: int = POINT_BUDGET):
+    """
+    `x` and `y` reduced to at most `max_points` points with LTTB.
+    """
+    if len(x) <= max_points:
+        return x, y
+    kept = lttb(x, y, max_points)
+    return x[kept], y[kept]
+
+
+def top_k(values: np.ndarray, k: int = LEADERBOARD_TOP_K) -> np.ndarray:
+    """
+    Indices of the `k` largest values, largest first; ties keep their order.
+    """
+    order = np.argsort(-values, kind="stable")
+    return order[:k]
+
+
+def scatter_trace(n_points: int):
+    """
+    The scatter trace type for a series of `n_points`: WebGL for long ones.
+
+    Pass the length of the series before it is downsampled, which is at most
+    POINT_BUDGET after, so that long histories still switch to WebGL.
+    """
+    return go.Scattergl if n_points > WEBGL_THRESHOLD else go.Scatter
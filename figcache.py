@@ -0,0 +1,137 @@
+import functools
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+from metrics import cache_lookup, timed
+from streamlit.proto.PlotlyChart_pb2 import PlotlyChart as PlotlyChartProto
+
+try:
+    # Plotly imports orjson on first use and picks it up from sys.modules,
+    # so renders in concurrent sessions can see it half initialized
+    import orjson  # noqa: F401
+except ImportError:
+    pass
+
+# ----------------------------
+# Cache of serialized Plotly figures
+
+
+class FigureCache:
+    """
+    Bounded LRU cache of Plotly figures serialized to JSON.
+
+    Entries are evicted least recently used first once their total size goes
+    over `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key, render, name: str = "figure"):
+        """
+        Return the cached value for `key`, calling `render` on a miss.
+
+        `render` returns a JSON string or a tuple of JSON strings. Lookups
+        are counted in the metrics under `name`.
+        """
+        with self._lock:
+            hit = key in self._entries
+            if hit:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                value = self._entries[key][0]
+            else:
+                self.misses += 1
+        cache_lookup("figure", name, "hit" if hit else "miss")
+        if hit:
+            return value
+
+        value = render()
+        size = (
+            sum(len(spec) for spec in value) if isinstance(value, tuple) else len(value)
+        )
+
+        with self._lock:
+            if key not in self._entries and size <= self.max_bytes:
+                self._entries[key] = (value, size)
+                self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+FIGURES = FigureCache(
+    max_bytes=int(os.environ.get("FIGURE_CACHE_BYTES", 64 * 1024 * 1024))
+)
+
+
+def cached_figure(func):
+    """
+    Cache the serialized figure(s) returned by a render function.
+
+    The first argument of the function must be a `load.Dataset`; the cache
+    key is made of the function, the dataset's name and version, and the
+    remaining arguments. The wrapped function returns a JSON string (or a
+    tuple of them) for `plotly_chart`.
+    """
+
+    @functools.wraps(func)
+    def wrapper(dataset, *args, **kwargs):
+        key = (
+            func.__code__.co_filename,
+            func.__qualname__,
+            dataset.name,
+            dataset.version,
+            args,
+            tuple(sorted(kwargs.items())),
+        )
+
+        def render():
+            with timed("render", func.__name__):
+                figure = func(dataset, *args, **kwargs)
+            with timed("serialize", func.__name__) as span:
+                if isinstance(figure, tuple):
+                    spec = tuple(f.to_json() for f in figure)
+                    span.nbytes = sum(len(s) for s in spec)
+                else:
+                    spec = figure.to_json()
+                    span.nbytes = len(spec)
+            return spec
+
+        return FIGURES.get_or_render(key, render, func.__name__)
+
+    return wrapper
+
+
+def plotly_chart(spec: str, use_container_width: bool = False, theme="streamlit"):
+    """
+    Display a figure already serialized to JSON, like `st.plotly_chart`.
+
+    `st.plotly_chart` validates and serializes the figure on every rerun;
+    this sends the cached JSON as is.
+    """
+    proto = PlotlyChartProto()
+    proto.use_container_width = use_container_width
+    proto.figure.spec = spec
+    proto.figure.config = json.dumps({"showLink": False, "linkText": False})
+    proto.theme = theme or ""
+    return st._main._enqueue("plotly_chart", proto)
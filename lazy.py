@@ -0,0 +1,45 @@
+import importlib
+import sys
+import threading
+import types
+
+# ----------------------------
+# Lazy imports of heavy optional modules
+
+_import_lock = threading.Lock()
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stand-in for a module that is only imported on first attribute access.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        if self.__dict__["_module"] is None:
+            with _import_lock:
+                if self.__dict__["_module"] is None:
+                    self.__dict__["_module"] = importlib.import_module(self.__name__)
+        return self.__dict__["_module"]
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """
+    Return `name` if it is already imported, or a `LazyModule` for it.
+
+    Use it for modules that are slow to import and only needed by some
+    renders, e.g. matplotlib through `calplot`, so that importing a page does
+    not pay for them.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
@@ -1,26 +1,63 @@
+import functools
+import hmac
 import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, NamedTuple
 
+import pyarrow as pa
+import requests
 import streamlit as st
-from deta import Deta
+from metrics import DEBUG_PARAM, begin_rerun, cache_lookup, timed
+from profiler import PROFILE_PARAM, profile_page, profiling
+from requests.adapters import HTTPAdapter
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from urllib3.util.retry import Retry
 
 
 def init_page(*, pg_title="JSK's Stats", pg_icon=":stars:", title=None, layout="wide"):
     """
     Initialize a streamlit page with a title, icon, and CSS styles.
+
+    With ?profile=<PROFILE_TOKEN>, the whole page is run again under the
+    profiler from here instead, and the rest of this run is skipped.
     """
+    if not profiling() and _profile_requested():
+        profile_page(sys._getframe(1).f_globals["__file__"], pg_title)
+        st.stop()
+
     st.set_page_config(
         page_title=pg_title,
         page_icon=pg_icon,
         layout=layout,
     )
+    # Lists this rerun's loads and renders in the sidebar with ?debug=1
+    begin_rerun(pg_title, debug=DEBUG_PARAM in st.experimental_get_query_params())
+
+    with timed("page", pg_title):
+        # Load CSS styles
+        if "css" not in st.session_state:
+            st.session_state["css"] = open("assets/style.css").read()
+        st.markdown(
+            f"<style>{st.session_state['css']}\n</style>", unsafe_allow_html=True
+        )
+
+        if title:
+            st.title(title)
 
-    # Load CSS styles
-    if "css" not in st.session_state:
-        st.session_state["css"] = open("assets/style.css").read()
-    st.markdown(f"<style>{st.session_state['css']}\n</style>", unsafe_allow_html=True)
 
-    if title:
-        st.title(title)
+def _profile_requested() -> bool:
+    values = st.experimental_get_query_params().get(PROFILE_PARAM)
+    if not values:
+        return False
+    try:
+        token = get_env_var("PROFILE_TOKEN")
+    except KeyError:
+        return False
+    # Profiling stays off unless a token is configured
+    return bool(token) and hmac.compare_digest(values[0].encode(), token.encode())
 
 
 def get_env_var(VAR_NAME: str, from_env: bool = False):
@@ -34,32 +71,280 @@ def get_env_var(VAR_NAME: str, from_env: bool = False):
     return env_var
 
 
+# ----------------------------
+# Caching
+
+
+class Dataset(NamedTuple):
+    """
+    A loaded dataset along with a token identifying the version of its data.
+
+    Cached render functions take the dataset as an underscored argument,
+    which Streamlit does not hash, and the version as a plain one, so that a
+    cache lookup costs the same whatever the size of the data.
+    """
+
+    name: str
+    version: str
+    frame: Any
+    # yearindex.YearIndex of the frame, for datasets sorted by date
+    index: Any = None
+
+    def year(self, year: int = None):
+        """
+        The rows of `year`, or all rows without one, from the year index.
+        """
+        return self.index.take(self.frame, year)
+
+
+class _CacheEntry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = None
+        self.loaded_at = None
+        self.refreshing = False
+
+
+_cache_entries = {}
+_cache_entries_lock = threading.Lock()
+
+
+def _cache_entry(key) -> _CacheEntry:
+    with _cache_entries_lock:
+        if key not in _cache_entries:
+            _cache_entries[key] = _CacheEntry()
+        return _cache_entries[key]
+
+
+def _refresh(entry: _CacheEntry, func, args, kwargs):
+    try:
+        value = func(*args, **kwargs)
+    except Exception as e:
+        print(f"Refreshing {func.__qualname__} failed, keeping stale data: {e}")
+    else:
+        with entry.lock:
+            entry.value = value
+            entry.loaded_at = time.monotonic()
+    finally:
+        entry.refreshing = False
+
+
+def stale_while_revalidate(ttl: float, name: str = None):
+    """
+    Cache the result of a data loader for all sessions of this process.
+
+    Once the result is older than `ttl` seconds, callers are still served the
+    last good result immediately while a single background thread refreshes
+    it. Only the very first load of a dataset blocks, and concurrent first
+    callers wait for the same load instead of starting their own.
+
+    Cached values are shared between sessions and must not be mutated.
+    """
+
+    def decorator(func):
+        cache_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            entry = _cache_entry((cache_name, args, tuple(sorted(kwargs.items()))))
+
+            if entry.loaded_at is None:
+                with entry.lock:
+                    if entry.loaded_at is None:
+                        cache_lookup("loader", cache_name, "miss")
+                        entry.value = func(*args, **kwargs)
+                        entry.loaded_at = time.monotonic()
+                    else:
+                        # Another caller's first load finished meanwhile
+                        cache_lookup("loader", cache_name, "hit")
+                return entry.value
+
+            if time.monotonic() - entry.loaded_at <= ttl:
+                cache_lookup("loader", cache_name, "hit")
+            else:
+                cache_lookup("loader", cache_name, "stale")
+                with entry.lock:
+                    start_refresh = not entry.refreshing
+                    entry.refreshing = True
+                if start_refresh:
+                    thread = threading.Thread(
+                        target=_refresh,
+                        args=(entry, func, args, kwargs),
+                        name=f"refresh-{cache_name}",
+                        daemon=True,
+                    )
+                    add_script_run_ctx(thread, get_script_run_ctx())
+                    thread.start()
+
+            return entry.value
+
+        return wrapper
+
+    return decorator
+
+
+# ----------------------------
+# Deta Base client
+
+DETA_API = os.environ.get("DETA_API", "https://database.deta.sh/v1")
+# Concurrent requests to Deta from this process, and (connect, read) timeouts
+DETA_MAX_CONCURRENCY = int(os.environ.get("DETA_MAX_CONCURRENCY", 8))
+DETA_TIMEOUT = (
+    float(os.environ.get("DETA_CONNECT_TIMEOUT", 5)),
+    float(os.environ.get("DETA_READ_TIMEOUT", 30)),
+)
+
+
+class FetchResponse(NamedTuple):
+    items: list
+    last: str
+    count: int
+
+
+class DetaBase:
+    """
+    A Deta Base, queried through the client's pooled HTTP session.
+    """
+
+    def __init__(self, client: "DetaClient", name: str):
+        self.client = client
+        self.name = name
+        self.url = f"{DETA_API}/{client.project_id}/{name}"
+
+    def fetch(self, query=None, limit: int = 1000, last: str = None):
+        """
+        Fetch one page of items, like `deta.Base.fetch`.
+        """
+        if query is None:
+            query = []
+        elif isinstance(query, dict):
+            query = [query]
+        body = {"query": query, "limit": limit}
+        if last is not None:
+            body["last"] = last
+
+        with timed("request", self.name) as span:
+            data = self.client.request("POST", f"{self.url}/query", json=body)
+            items = data.get("items", [])
+            span.rows = len(items)
+        paging = data.get("paging", {})
+        return FetchResponse(items, paging.get("last"), paging.get("size", 0))
+
+
+class DetaClient:
+    """
+    Process-wide Deta client over one keep-alive HTTP session.
+
+    Connections are pooled, so paginated fetches reuse the same TLS
+    connection. At most DETA_MAX_CONCURRENCY requests are in flight at
+    once, each with DETA_TIMEOUT, and 429 and 5xx responses and connection
+    errors are retried with exponential backoff (honoring Retry-After).
+    """
+
+    def __init__(self, project_key: str, max_concurrency: int = None):
+        max_concurrency = max_concurrency or DETA_MAX_CONCURRENCY
+        self.project_id = project_key.split("_")[0]
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+
+        retry = Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            # Queries only read, so they are safe to retry
+            allowed_methods=frozenset({"GET", "POST"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=max_concurrency, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(
+            {"X-API-Key": project_key, "Content-Type": "application/json"}
+        )
+
+    def Base(self, name: str) -> DetaBase:
+        return DetaBase(self, name)
+
+    def request(self, method: str, url: str, **kwargs) -> dict:
+        with self._semaphore:
+            response = self.session.request(method, url, timeout=DETA_TIMEOUT, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+
 # ----------------------------
 # Data Functions
 
 
-@st.cache_resource
-def connect_to_deta():
+@functools.lru_cache(maxsize=None)
+def connect_to_deta() -> DetaClient:
     """
     Connect to Deta.
     """
-    if "deta" not in st.session_state:
-        deta_project_key = get_env_var("DETA_PROJECT_KEY")
-        st.session_state["deta"] = Deta(deta_project_key)
-    return st.session_state["deta"]
+    # One client per process, shared by all sessions and the boot-time
+    # warmer; st.cache_resource does not cache outside of a script run
+    deta_project_key = get_env_var("DETA_PROJECT_KEY")
+    return DetaClient(deta_project_key)
 
 
-def fetch_all_from_deta_base(deta_base_db):
+def iter_deta_pages(deta_base_db, query=None, limit: int = 1000, prefetch=True):
     """
-    Fetch all items from a Deta Base.
+    Yield the pages of items of a Deta Base as they arrive.
+
+    With `prefetch`, the next page is requested on a background thread while
+    the caller is still processing the current one.
     """
+    if not prefetch:
+        response = deta_base_db.fetch(query, limit=limit)
+        yield response.items
+        while response.last:
+            response = deta_base_db.fetch(query, limit=limit, last=response.last)
+            yield response.items
+        return
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        future = pool.submit(deta_base_db.fetch, query, limit=limit)
+        while future is not None:
+            response = future.result()
+            if response.last:
+                future = pool.submit(
+                    deta_base_db.fetch, query, limit=limit, last=response.last
+                )
+            else:
+                future = None
+            yield response.items
 
-    response = deta_base_db.fetch()
-    all_items = response.items
 
-    while response.last:
-        response = deta_base_db.fetch(last=response.last)
-        all_items += response.items
-        all_items += response.items
+def fetch_deta_base_table(deta_base_db, query=None, decode=None) -> pa.Table:
+    """
+    Fetch all items from a Deta Base into an Arrow table.
+
+    Every page is converted to a record batch as soon as it arrives, so only
+    one page of items is ever held as Python dicts. `decode` turns a page of
+    items into a record batch; by default the types are inferred from the
+    first page and reused for the rest.
+    """
+    schema = None
+    batches = []
+    with timed("fetch", deta_base_db.name) as span:
+        for items in iter_deta_pages(deta_base_db, query=query):
+            if not items:
+                continue
+            if decode is not None:
+                batch = decode(items)
+            else:
+                batch = pa.RecordBatch.from_pylist(items, schema=schema)
+            schema = batch.schema
+            batches.append(batch)
 
-    return all_items
+        if batches:
+            table = pa.Table.from_batches(batches, schema=schema)
+        elif decode is not None:
+            table = pa.Table.from_batches([decode([])])
+        else:
+            table = pa.table({})
+        span.rows, span.nbytes = table.num_rows, table.nbytes
+    return table
@@ -0,0 +1,321 @@
+import bisect
+import functools
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ----------------------------
+# Metrics of the hot paths: Deta fetches, loaders, caches and renders
+
+# Every observation is labelled with a stage and a name, e.g. ("load",
+# "load_github_data") or ("render", "draw_contrib_heatmap"). The stages are:
+#   page       init_page of a rerun
+#   request    one HTTP request to Deta
+#   fetch      fetching a whole Deta Base
+#   load       building a dataset in a loader
+#   render     building a Plotly (or matplotlib) figure
+#   serialize  turning a figure into JSON for the browser
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = tuple(10**n for n in range(1, 10))
+
+# The metrics are written in Prometheus' text format to METRICS_FILE every
+# METRICS_INTERVAL seconds, and served on http://127.0.0.1:METRICS_PORT/metrics
+# too if METRICS_PORT is set
+METRICS_FILE = os.environ.get(
+    "METRICS_FILE", os.path.join(tempfile.gettempdir(), "howisjsk-metrics.prom")
+)
+METRICS_INTERVAL = float(os.environ.get("METRICS_INTERVAL", 15))
+METRICS_PORT = os.environ.get("METRICS_PORT")
+
+# Query parameter that shows the breakdown of a rerun in the sidebar
+DEBUG_PARAM = "debug"
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    escaped = ((k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series = {}  # labels -> [count per bucket..., +Inf], sum
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(k, list(c), s) for k, (c, s) in sorted(self._series.items())]
+        for key, counts, total in series:
+            cumulative = 0
+            for le, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                labels = _labels((*key, ("le", le)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_labels(key)} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = sorted(self._series.items())
+        lines.extend(f"{self.name}{_labels(key)} {value}" for key, value in series)
+        return lines
+
+
+DURATION = Histogram(
+    "howisjsk_duration_seconds", "Time spent per stage.", DURATION_BUCKETS
+)
+ROWS = Histogram("howisjsk_rows", "Rows handled per stage.", SIZE_BUCKETS)
+BYTES = Histogram("howisjsk_bytes", "Bytes handled per stage.", SIZE_BUCKETS)
+CACHE = Counter("howisjsk_cache_requests_total", "Cache lookups by result.")
+METRICS = [DURATION, ROWS, BYTES, CACHE]
+
+
+def render_metrics() -> str:
+    """
+    All metrics in Prometheus' text exposition format.
+    """
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+
+# ----------------------------
+# Per-rerun breakdown
+
+_local = threading.local()
+
+
+class RerunTrace:
+    """
+    The observations of one rerun, shown in a sidebar table as they come in.
+    """
+
+    def __init__(self, page: str):
+        import streamlit as st
+
+        self.page = page
+        self.start = time.perf_counter()
+        self.rows = []
+        with st.sidebar.expander(f"Rerun metrics: {page}", expanded=True):
+            self.placeholder = st.empty()
+
+    def add(self, stage: str, name: str, **values):
+        at = (time.perf_counter() - self.start) * 1000
+        self.rows.append({"at (ms)": round(at, 1), "stage": stage, "name": name})
+        self.rows[-1].update(values)
+        self.placeholder.dataframe(self.rows, use_container_width=True)
+
+
+def begin_rerun(page: str, debug: bool = False):
+    """
+    Start tracing the current rerun of `page`, if `debug` is set.
+
+    Observations made on the script thread are then listed in the sidebar.
+    """
+    _local.trace = RerunTrace(page) if debug else None
+
+
+def _trace():
+    return getattr(_local, "trace", None)
+
+
+# ----------------------------
+# Recording
+
+
+def record(stage: str, name: str, seconds=None, rows=None, nbytes=None):
+    """
+    Record an observation of a stage. Unknown values are left out.
+    """
+    _start_exporter()
+    if seconds is not None:
+        DURATION.observe(seconds, stage=stage, name=name)
+    if rows is not None:
+        ROWS.observe(rows, stage=stage, name=name)
+    if nbytes is not None:
+        BYTES.observe(nbytes, stage=stage, name=name)
+
+    trace = _trace()
+    if trace is not None:
+        values = {"ms": None if seconds is None else round(seconds * 1000, 1)}
+        values.update(rows=rows, bytes=nbytes)
+        trace.add(stage, name, **values)
+
+
+def cache_lookup(cache: str, name: str, result: str):
+    """
+    Count a lookup in a cache; `result` is "hit", "miss" or "stale".
+    """
+    _start_exporter()
+    CACHE.inc(cache=cache, name=name, result=result)
+
+    trace = _trace()
+    if trace is not None:
+        trace.add("cache", name, cache=f"{cache} {result}")
+
+
+class Span:
+    def __init__(self):
+        self.rows = None
+        self.nbytes = None
+
+
+@contextmanager
+def timed(stage: str, name: str):
+    """
+    Time a block as a stage. Set `rows` and `nbytes` on the yielded span to
+    record them along with the time.
+    """
+    span = Span()
+    start = time.perf_counter()
+    try:
+        yield span
+    finally:
+        record(stage, name, time.perf_counter() - start, span.rows, span.nbytes)
+
+
+def _frame(value):
+    # Loaders return a Dataset, a frame or a tuple of them; the first counts
+    if hasattr(value, "frame"):
+        return value.frame
+    if isinstance(value, tuple) and value:
+        return _frame(value[0])
+    return value
+
+
+def frame_size(value) -> tuple:
+    """
+    (rows, bytes) of an Arrow table, a polars or pandas DataFrame or Series,
+    or None for the ones that cannot be told.
+    """
+    frame = _frame(value)
+    rows = len(frame) if hasattr(frame, "__len__") else None
+    if hasattr(frame, "nbytes") and not callable(frame.nbytes):
+        nbytes = frame.nbytes  # Arrow, and pandas Series
+    elif hasattr(frame, "estimated_size"):
+        nbytes = frame.estimated_size()  # polars
+    elif hasattr(frame, "memory_usage"):
+        nbytes = int(frame.memory_usage(index=False).sum())  # pandas DataFrame
+    else:
+        nbytes = None
+    return rows, nbytes
+
+
+def instrument(stage: str, name: str = None):
+    """
+    Time every call of a function as a stage, along with the size of the
+    frame it returns.
+    """
+
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(stage, stage_name) as span:
+                value = func(*args, **kwargs)
+                span.rows, span.nbytes = frame_size(value)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+# ----------------------------
+# Exporters
+
+_exporter_started = False
+_exporter_lock = threading.Lock()
+
+
+def write_metrics(path: str = METRICS_FILE):
+    """
+    Write the metrics to a sidecar file, atomically.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-metrics-")
+    with os.fdopen(fd, "w") as f:
+        f.write(render_metrics())
+    os.replace(tmp_path, path)
+
+
+def _write_periodically():
+    while True:
+        time.sleep(METRICS_INTERVAL)
+        try:
+            write_metrics()
+        except OSError as e:
+            print(f"Writing metrics to {METRICS_FILE} failed: {e}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _start_exporter():
+    global _exporter_started
+    if _exporter_started:
+        return
+    with _exporter_lock:
+        if _exporter_started:
+            return
+        _exporter_started = True
+
+    threading.Thread(
+        target=_write_periodically, name="metrics-writer", daemon=True
+    ).start()
+    if METRICS_PORT:
+        try:
+            server = ThreadingHTTPServer(
+                ("127.0.0.1", int(METRICS_PORT)), _MetricsHandler
+            )
+        except OSError as e:
+            print(f"Serving metrics on port {METRICS_PORT} failed: {e}")
+            return
+        threading.Thread(
+            target=server.serve_forever, name="metrics-server", daemon=True
+        ).start()
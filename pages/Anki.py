@@ -0,0 +1,99 @@
+import streamlit as st
+from anki import read_state
+from charts import (
+    anki_years,
+    draw_retention,
+    draw_review_calendar,
+    draw_reviews_per_day,
+)
+from datasets import load_anki_data
+from figcache import plotly_chart
+from load import Dataset, init_page
+from prefetch import cancel_warmer
+
+# ----------------------------
+# Initialize page
+init_page(
+    pg_title="Anki",
+    pg_icon="🗂️",
+    title="🗂️ Anki Reviews",
+)
+cancel_warmer("Anki")
+
+# ----------------------------
+# Functions
+
+
+def review_metrics(anki: Dataset, year: int = None):
+    df = anki.year(year)
+    total = anki.index.total(year)
+    avg_per_day = round(df["Reviews"].mean(), 2) if df.height else 0
+    graduated = df["Graduated Reviews"].sum()
+    retention = round(100 * df["Passed"].sum() / graduated, 1) if graduated else None
+    return total, avg_per_day, retention
+
+
+# ----------------------------
+# Global Variables
+
+state = read_state()
+if "version" not in state:
+    st.info("The Anki review log has not been downloaded yet.")
+    st.stop()
+
+anki = load_anki_data(state["version"])
+yr_options = anki_years(anki)
+yr_options.append(None)
+
+# ----------------------------
+# Main Page
+
+with st.container():
+    pcol1, pcol2 = st.columns([3, 1])
+
+    with pcol1:
+        st.markdown("<br>", unsafe_allow_html=True)
+        st.caption(f"Last review on {anki.frame['Date'].max()}.")
+
+    with pcol2:
+        selected_year = st.selectbox(
+            label="Select year in data:",
+            options=yr_options,
+            # The latest year, or "All years" if there are no reviews yet
+            index=max(len(yr_options) - 2, 0),
+            format_func=lambda y: "All years" if y is None else y,
+        )
+
+total_reviews, avg_reviews, retention = review_metrics(anki, selected_year)
+
+with st.container():
+    mcol1, mcol2, mcol3 = st.columns(3)
+
+    with mcol1:
+        st.metric(label="Total Reviews", value=total_reviews)
+
+    with mcol2:
+        st.metric(label="AVG Reviews per Day", value=avg_reviews)
+
+    with mcol3:
+        st.metric(
+            label="Retention",
+            value="-" if retention is None else f"{retention}%",
+        )
+
+st.markdown("---")
+
+plotly_chart(
+    draw_review_calendar(anki, year=selected_year),
+    use_container_width=True,
+)
+
+plotly_chart(
+    draw_reviews_per_day(anki, year=selected_year),
+    use_container_width=True,
+)
+
+plotly_chart(
+    draw_retention(anki, year=selected_year),
+    use_container_width=True,
+)
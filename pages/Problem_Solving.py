@@ -1,12 +1,11 @@
 import datetime
 
-import calplot
-import pandas as pd
-import plotly.express as px
-import polars as pl
 import streamlit as st
-from load import connect_to_deta, fetch_all_from_deta_base, init_page
-from plotly_calplot import calplot as pcalplot
+from charts import draw_solve_calplot, draw_solve_timecharts, solve_metrics
+from datasets import load_problem_solving_data
+from figcache import plotly_chart
+from load import init_page
+from prefetch import cancel_warmer
 
 # ----------------------------
 # Initialize page
@@ -15,190 +14,21 @@ init_page(
     pg_icon="👨‍💻",
     title="Problems Solving",
 )
-
-# ----------------------------
-# Functions
-
-
-@st.cache_data(ttl=43200)
-def load_problem_solving_data() -> pl.DataFrame:
-    """
-    Load Problem Solving data from Deta.
-    """
-    # Load GitHub Contributions data from Deta
-    deta = connect_to_deta()
-    problem_solving_db = deta.Base("solve")
-    problem_solving = fetch_all_from_deta_base(problem_solving_db)
-
-    df = pl.DataFrame(problem_solving)
-    df = df.drop(["event", "type"])
-    df = df.with_columns(
-        [
-            pl.col("timestamp").sort_by(by="timestamp", descending=True),
-        ]
-    )
-    df = df.with_columns(
-        [
-            pl.from_epoch("timestamp").cast(pl.Datetime),
-        ]
-    )
-
-    df = df.with_columns(
-        [
-            pl.col("timestamp").dt.truncate("1d").cast(pl.Date).alias("Date"),
-            pl.col("value").alias("Problems Solved"),
-        ]
-    )
-    df = df.groupby("Date", maintain_order=True).agg(pl.col("Problems Solved").sum())
-    date_df = df.to_pandas(date_as_object=False)
-
-    return df, date_df
-
-
-def generate_streak_info(
-    df: pd.DataFrame,
-    streak_column: str,
-    null_value,
-    count_null_streak: bool = False,
-) -> pd.DataFrame:
-    """
-    Parameters
-    ----------
-
-    df:
-        A dataframe containing a datetime index and a column with a null value
-        that corresponds to the end of a streak.
-
-    streak_column:
-        The column that contains the streak data.
-
-    null_value:
-        The value that indicates the end of a streak.
-
-    Returns
-    -------
-    final_df:
-        A dataframe with the streak information added as a new column.
-
-    Note
-    ----
-    This function is based on the following post:
-    https://joshdevlin.com/blog/calculate-streaks-in-pandas/
-    """
-    data = df[streak_column].to_frame()
-    data["result"] = data[streak_column] != null_value
-    if count_null_streak:
-        data["start_of_streak"] = data["result"].ne(data["result"].shift())
-    else:
-        data["start_of_streak"] = (data["result"].ne(data["result"].shift())) + data[
-            "result"
-        ].eq(False)
-    data["streak_id"] = data.start_of_streak.cumsum()
-    data[f"{streak_column} Streak"] = data.groupby("streak_id").cumcount() + 1
-    final_df = pd.concat([df, data[f"{streak_column} Streak"]], axis=1)
-    return final_df
-
-
-@st.cache_data()
-def draw_plotly_calplot(df: pd.DataFrame, year: int = None):
-    if year is not None:
-        df = df.loc[df["Date"].dt.year == year]
-        total_height = 200
-        title = f"Problems Solved in {year}"
-        years_title = False
-    else:
-        total_height = None
-        title = "Problems Solved"
-        years_title = True
-
-    fig = pcalplot(
-        df,
-        x="Date",
-        y="Problems Solved",
-        # colorscale=cmap,
-        total_height=total_height,
-        title=title,
-        years_title=years_title,
-        name="Problems Solved",
-    )
-
-    return fig
-
-
-def draw_plotly_timecharts(df: pl.DataFrame, select_year: int = None):
-    if select_year is not None:
-        df = df.filter(
-            pl.col("Date").dt.year() == select_year,
-        )
-
-    leader_df = df.sort("Problems Solved", descending=True).to_pandas()
-    leader_df["Date"] = leader_df["Date"].astype(str)
-    date_df = df.to_pandas(date_as_object=False)
-
-    fig_timeline = px.area(date_df, x="Date", y="Problems Solved")
-    fig_timeline.update_layout(title="Timeline")
-
-    fig_leaderboard = px.bar(
-        leader_df,
-        x="Problems Solved",
-        y="Date",
-        color="Problems Solved",
-    )
-    fig_leaderboard.update_layout(
-        yaxis_type="category",
-        yaxis={"categoryorder": "total ascending"},
-        title="Leaderboard",
-    )
-
-    return fig_leaderboard, fig_timeline
-
-
-def solve_metrics(df: pl.DataFrame, count_null_streak: bool = False):
-    total_solved = df.select(pl.col("Problems Solved").sum())["Problems Solved"][0]
-    avg_solve_perday = round(
-        df.select(pl.col("Problems Solved").mean())["Problems Solved"][0], 2
-    )
-
-    stdf = df.to_pandas(date_as_object=False)
-    stdf = stdf.sort_values(by="Date", ascending=True)
-    stdf = stdf.set_index("Date", drop=True)
-    stdf = stdf.asfreq("D", fill_value=0)
-    stdf = generate_streak_info(
-        stdf, "Problems Solved", 0, count_null_streak=count_null_streak
-    )
-    max_streak = stdf["Problems Solved Streak"].max()
-    current_streak = int(stdf["Problems Solved Streak"].iloc[-1])
-    # if len(stdf) > 1:
-    #     previous_streak = int(stdf["Problems Solved Streak"].iloc[-2])
-    # else:
-    #     previous_streak = 0
-
-    # streak_delta = current_streak - previous_streak
-    # if streak_delta > 0:
-    #     streak_delta = f"+{streak_delta}"
-
-    return (
-        total_solved,
-        avg_solve_perday,
-        max_streak,
-        current_streak,
-        stdf,
-    )
-
+cancel_warmer("Problem Solving")
 
 # ----------------------------
 # Global Variables
 current_year = datetime.datetime.now().year
 yr_options = list(range(2023, current_year + 1))
 yr_options.append(None)
-solve_df, date_df = load_problem_solving_data()
+solve_ds = load_problem_solving_data()
 (
     total_solved,
     avg_solved,
     max_streak,
     current_streak,
-    streak_df,
-) = solve_metrics(solve_df, count_null_streak=False)
+    streak_intervals,
+) = solve_metrics(solve_ds, count_null_streak=False)
 
 
 # selected_year = st.slider(
@@ -264,19 +94,19 @@ with st.container():
 
 st.markdown("---")
 
-st.plotly_chart(
-    draw_plotly_calplot(date_df, year=selected_year),
+plotly_chart(
+    draw_solve_calplot(solve_ds, year=selected_year),
     use_container_width=True,
 )
 
-fig_leaderboard, fig_timeline = draw_plotly_timecharts(solve_df)
+fig_leaderboard, fig_timeline = draw_solve_timecharts(solve_ds)
 
-st.plotly_chart(
+plotly_chart(
     fig_timeline,
     use_container_width=True,
 )
 
-st.plotly_chart(
+plotly_chart(
     fig_leaderboard,
     use_container_width=True,
 )
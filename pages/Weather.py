@@ -3,7 +3,11 @@ import datetime
 import pandas as pd
 import pytz
 import streamlit as st
-from load import connect_to_deta, fetch_all_from_deta_base, init_page
+from charts import WEATHER_FIELDS, draw_weather_history
+from datasets import load_weather_data, load_weather_history
+from figcache import plotly_chart
+from load import init_page
+from prefetch import cancel_warmer
 
 # ----------------------------
 # Initialize page
@@ -12,33 +16,12 @@ init_page(
     pg_icon="⛅",
     title="⛅ Weather",
 )
+cancel_warmer("Weather")
 
 # ----------------------------
 # Functions
 
 
-@st.cache_data(ttl=1800)
-def load_weather_data() -> pd.DataFrame:
-    """
-    Load Weather data from Deta.
-    """
-    # Load GitHub Contributions data from Deta
-    deta = connect_to_deta()
-    weather_db = deta.Base("weather")
-    weather = fetch_all_from_deta_base(weather_db)
-
-    df = pd.DataFrame(weather).drop(columns=["key"])
-    df["dt00"] = pd.to_datetime(df["dt00"], unit="s", utc=True)
-    df["sunr"] = pd.to_datetime(df["sunr"], unit="s", utc=True)
-    df["suns"] = pd.to_datetime(df["suns"], unit="s", utc=True)
-    df["date"] = df["dt00"].dt.tz_convert(pytz.timezone("Asia/Manila"))
-    df.sort_values(by="date", inplace=True, ascending=False)
-    df.reset_index(drop=True, inplace=True)
-    # df = df.set_index("date")
-
-    return df
-
-
 @st.cache_data(ttl=43200)
 def show_sunrise_sunset(df: pd.DataFrame) -> tuple[str, str, str]:
     """
@@ -162,6 +145,34 @@ def show_current_weather():
             )
 
 
+def show_weather_history():
+    with st.expander("Weather History", expanded=True):
+        hcol1, hcol2 = st.columns([3, 1])
+
+        with hcol1:
+            today = current_time.date()
+            dates = st.date_input(
+                label="Select date range:",
+                value=(today - datetime.timedelta(days=365), today),
+                max_value=today,
+            )
+
+        with hcol2:
+            field = st.selectbox(
+                label="Select measurement:",
+                options=list(WEATHER_FIELDS),
+                format_func=lambda f: WEATHER_FIELDS[f][0],
+            )
+
+        # The range is incomplete while its end is being picked
+        if len(dates) == 2:
+            history = load_weather_history(*dates)
+            plotly_chart(
+                draw_weather_history(history, field=field),
+                use_container_width=True,
+            )
+
+
 # ----------------------------
 # Global variables
 
@@ -172,3 +183,4 @@ current_time = datetime.datetime.now(pytz.timezone("Asia/Manila"))
 # Page layout
 
 show_current_weather()
+show_weather_history()
@@ -0,0 +1,169 @@
+import os
+
+import plotly.express as px
+import polars as pl
+import streamlit as st
+from figcache import cached_figure, plotly_chart
+from load import Dataset, init_page
+from webhistory import DOMAIN_PATTERN, WEBHISTORY_DATASET
+
+# ----------------------------
+# Initialize page
+init_page(
+    pg_title="Web History",
+    pg_icon="🌐",
+    title="🌐 Web History",
+)
+
+DATASET_DIR = os.path.join("assets", WEBHISTORY_DATASET)
+
+# ----------------------------
+# Functions
+
+
+def dataset_years() -> list[int]:
+    """
+    Years present in the web history, from its partition directories.
+    """
+    return sorted(
+        (
+            int(d.split("=", 1)[1])
+            for d in os.listdir(DATASET_DIR)
+            if d.startswith("year=")
+        ),
+        reverse=True,
+    )
+
+
+def scan_history(year: int = None) -> pl.LazyFrame:
+    """
+    Lazily scan the web history Parquet dataset.
+
+    Only the files of the `year` partition are listed, so other years are
+    never opened. Filters and column selections on the returned frame are
+    pushed down into the Parquet reader.
+    """
+    partition = "year=*" if year is None else f"year={year}"
+    return pl.scan_parquet(os.path.join(DATASET_DIR, partition, "*", "*.parquet"))
+
+
+def history_columns(lf: pl.LazyFrame) -> tuple[str, str]:
+    """
+    Names of the visit time and URL columns of the export.
+    """
+    schema = lf.schema
+    time_column = next(
+        name for name, dtype in schema.items() if dtype in (pl.Datetime, pl.Date)
+    )
+    url_column = next(name for name in schema if "url" in name.lower())
+    return time_column, url_column
+
+
+def domain_expr(lf: pl.LazyFrame, url_column: str) -> pl.Expr:
+    """
+    The domain of every visit: the stored `domain` column, which the files
+    are sorted by so that filters on it skip row groups, or the host parsed
+    out of the URL for datasets converted before it was added.
+    """
+    if "domain" in lf.schema:
+        return pl.col("domain")
+    return pl.col(url_column).str.extract(DOMAIN_PATTERN, 1).alias("domain")
+
+
+def top_domains(year: int = None, n: int = 20) -> pl.DataFrame:
+    lf = scan_history(year)
+    _, url_column = history_columns(lf)
+    return (
+        lf.select(domain_expr(lf, url_column))
+        .groupby("domain")
+        .agg(pl.count().alias("Visits"))
+        .sort("Visits", descending=True)
+        .limit(n)
+        .collect(streaming=True)
+    )
+
+
+def hourly_activity(year: int = None, domain: str = None) -> pl.DataFrame:
+    lf = scan_history(year)
+    time_column, url_column = history_columns(lf)
+    if domain is not None:
+        lf = lf.filter(domain_expr(lf, url_column) == domain)
+    visits = (
+        lf.select(pl.col(time_column).dt.hour().alias("Hour"))
+        .groupby("Hour")
+        .agg(pl.count().alias("Visits"))
+        .collect(streaming=True)
+    )
+    hours = pl.DataFrame({"Hour": pl.Series(range(24), dtype=visits["Hour"].dtype)})
+    return hours.join(visits, on="Hour", how="left").fill_null(0)
+
+
+@st.cache_data(ttl=43200)
+def domain_options(version: str, year: int = None) -> list[str]:
+    return top_domains(year, n=100)["domain"].to_list()
+
+
+@cached_figure
+def draw_top_domains(history: Dataset, year: int = None):
+    df = top_domains(year).to_pandas()
+    fig = px.bar(df, x="Visits", y="domain", orientation="h")
+    fig.update_layout(
+        title="Top Domains",
+        yaxis={"categoryorder": "total ascending"},
+        yaxis_title="Domain",
+    )
+    return fig
+
+
+@cached_figure
+def draw_hourly_activity(history: Dataset, year: int = None, domain: str = None):
+    df = hourly_activity(year, domain).to_pandas()
+    fig = px.bar(df, x="Hour", y="Visits")
+    fig.update_layout(title="Activity by Hour of Day")
+    return fig
+
+
+# ----------------------------
+# Global variables
+
+if not os.path.isdir(DATASET_DIR):
+    st.info("The web history has not been downloaded yet.")
+    st.stop()
+
+history = Dataset(WEBHISTORY_DATASET, str(os.path.getmtime(DATASET_DIR)), DATASET_DIR)
+yr_options = dataset_years()
+yr_options.append(None)
+
+with st.container():
+    ocol1, ocol2 = st.columns(2)
+
+    with ocol1:
+        selected_year = st.selectbox(
+            label="Select year in data:",
+            options=yr_options,
+            format_func=lambda y: "All years" if y is None else y,
+        )
+
+    with ocol2:
+        domains = [None] + domain_options(history.version, selected_year)
+        selected_domain = st.selectbox(
+            label="Select domain:",
+            options=domains,
+            format_func=lambda d: "All domains" if d is None else d,
+        )
+
+
+# ----------------------------
+# Page Layout
+
+st.markdown("---")
+
+plotly_chart(
+    draw_top_domains(history, year=selected_year),
+    use_container_width=True,
+)
+
+plotly_chart(
+    draw_hourly_activity(history, year=selected_year, domain=selected_domain),
+    use_container_width=True,
+)
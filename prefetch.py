@@ -0,0 +1,213 @@
+import datetime
+import heapq
+import itertools
+import os
+import threading
+import time
+
+# ----------------------------
+# Page warmers
+
+# Each warmer loads a page's datasets and renders its figures with the same
+# arguments as the page's default view, into the caches the page reads from.
+
+
+def _warm_github():
+    from charts import GITHUB_CMAP, draw_contrib_heatmap, draw_github_calplot
+    from datasets import load_github_data
+
+    gh, _ = load_github_data()
+    year = datetime.datetime.now().year
+    draw_github_calplot(gh, year=year, cmap=GITHUB_CMAP)
+    draw_contrib_heatmap(gh, cmap=GITHUB_CMAP)
+
+
+def _warm_problem_solving():
+    from charts import draw_solve_calplot, draw_solve_timecharts
+    from datasets import load_problem_solving_data
+
+    solve_ds = load_problem_solving_data()
+    draw_solve_calplot(solve_ds, year=datetime.datetime.now().year)
+    draw_solve_timecharts(solve_ds)
+
+
+def _warm_weather():
+    from datasets import load_weather_data
+
+    load_weather_data()
+
+
+def _warm_anki():
+    from anki import read_state
+    from charts import (
+        anki_years,
+        draw_retention,
+        draw_review_calendar,
+        draw_reviews_per_day,
+    )
+    from datasets import load_anki_data
+
+    state = read_state()
+    if "version" not in state:
+        return
+    anki = load_anki_data(state["version"])
+    years = anki_years(anki)
+    if not years:
+        return
+    year = years[-1]
+    draw_review_calendar(anki, year=year)
+    draw_reviews_per_day(anki, year=year)
+    draw_retention(anki, year=year)
+
+
+# Page name -> (priority, warmer). Lower priorities run first; pages backed
+# by Deta come first as their cold loads are the slowest, in sidebar order.
+WARMERS = {
+    "GitHub": (0, _warm_github),
+    "Problem Solving": (1, _warm_problem_solving),
+    "Weather": (2, _warm_weather),
+    "Anki": (3, _warm_anki),
+}
+
+
+# ----------------------------
+# Prefetch scheduler
+
+
+class PrefetchJob:
+    def __init__(self, name: str, func, priority: int):
+        self.name = name
+        self.func = func
+        self.priority = priority
+        self.state = "pending"  # then running, done, failed or cancelled
+        self.error = None
+        self.finished = threading.Event()
+
+
+class PrefetchScheduler:
+    """
+    Run prefetch jobs on a small pool of daemon threads, by priority.
+
+    A job is identified by its name: submitting a name that is already
+    pending, running or done returns the existing job, raising its priority
+    if the new one is higher. Failed and cancelled jobs are run again. Pending
+    jobs can be cancelled; running ones finish.
+    """
+
+    def __init__(self, max_workers: int = 2):
+        self.max_workers = max_workers
+        self._lock = threading.Condition()
+        self._heap = []  # (priority, seq, job)
+        self._seq = itertools.count()
+        self._jobs = {}
+        self._workers = []
+
+    def submit(self, name: str, func, priority: int = 0) -> PrefetchJob:
+        with self._lock:
+            job = self._jobs.get(name)
+            if job is not None and job.state in ("pending", "running", "done"):
+                if job.state == "pending" and priority < job.priority:
+                    # The old heap entry is skipped once this one is popped
+                    job.priority = priority
+                    heapq.heappush(self._heap, (priority, next(self._seq), job))
+                    self._lock.notify()
+                return job
+
+            job = PrefetchJob(name, func, priority)
+            self._jobs[name] = job
+            heapq.heappush(self._heap, (priority, next(self._seq), job))
+            if len(self._workers) < self.max_workers:
+                worker = threading.Thread(
+                    target=self._work,
+                    name=f"prefetch-{len(self._workers)}",
+                    daemon=True,
+                )
+                self._workers.append(worker)
+                worker.start()
+            self._lock.notify()
+            return job
+
+    def cancel(self, name: str = None) -> bool:
+        """
+        Cancel a pending job, or all pending jobs without a name.
+
+        Returns whether anything was cancelled.
+        """
+        with self._lock:
+            jobs = self._jobs.values() if name is None else [self._jobs.get(name)]
+            cancelled = False
+            for job in jobs:
+                if job is not None and job.state == "pending":
+                    job.state = "cancelled"
+                    job.finished.set()
+                    cancelled = True
+            return cancelled
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Wait for the submitted jobs to finish. Returns False on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if not job.finished.wait(remaining):
+                return False
+        return True
+
+    def status(self) -> dict:
+        with self._lock:
+            return {name: job.state for name, job in self._jobs.items()}
+
+    def _next_job(self) -> PrefetchJob:
+        with self._lock:
+            while True:
+                while self._heap:
+                    priority, _, job = heapq.heappop(self._heap)
+                    if job.state == "pending" and priority == job.priority:
+                        job.state = "running"
+                        return job
+                self._lock.wait()
+
+    def _work(self):
+        while True:
+            job = self._next_job()
+            start = time.perf_counter()
+            try:
+                job.func()
+            except Exception as e:
+                job.error = e
+                job.state = "failed"
+                print(f"Prefetching {job.name} failed: {e}")
+            else:
+                job.state = "done"
+                print(f"Prefetched {job.name} in {time.perf_counter() - start:.2f}s")
+            finally:
+                job.finished.set()
+
+
+PREFETCH = PrefetchScheduler(
+    max_workers=int(os.environ.get("PREFETCH_WORKERS", len(WARMERS)))
+)
+
+
+def cancel_warmer(page: str) -> bool:
+    """
+    Cancel the warmer of a page that is being opened, if it has not started:
+    the page's own run loads and renders the same things, and the workers are
+    left to the other pages' warmers. A later `prefetch_pages` schedules it
+    again.
+    """
+    return PREFETCH.cancel(page)
+
+
+def prefetch_pages(pages=None) -> dict:
+    """
+    Schedule the warmers of `pages` (all by default) and return their jobs.
+    """
+    pages = WARMERS if pages is None else pages
+    return {
+        page: PREFETCH.submit(page, WARMERS[page][1], WARMERS[page][0])
+        for page in pages
+    }
@@ -0,0 +1,144 @@
+import os
+import re
+import runpy
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+# ----------------------------
+# On-demand sampling profiler for page reruns
+
+# A profiled rerun samples the stack of the script thread every
+# PROFILE_INTERVAL seconds and saves the samples as folded stacks, which
+# flamegraph.pl, speedscope and inferno all read, under PROFILE_DIR.
+PROFILE_DIR = os.environ.get(
+    "PROFILE_DIR", os.path.join(tempfile.gettempdir(), "howisjsk-profiles")
+)
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", 0.005))
+# Query parameter that turns profiling on; its value must be PROFILE_TOKEN
+PROFILE_PARAM = "profile"
+TOP_N = 20
+
+_local = threading.local()
+
+
+def _frame_label(code) -> str:
+    path = code.co_filename
+    for prefix in sorted(sys.path, key=len, reverse=True):
+        if prefix and path.startswith(prefix + os.sep):
+            path = path[len(prefix) + 1 :]
+            break
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Sample the call stack of one thread from a background thread.
+    """
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()  # stack from the root, as code objects -> count
+        self.duration = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(
+            target=self._sample, name="profiler", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._start
+
+    def _sample(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            if stack:
+                self.samples[tuple(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        """
+        The samples as folded stacks, one "root;...;leaf count" per line.
+        """
+        labels = {}
+        lines = []
+        for stack, count in self.samples.most_common():
+            for code in stack:
+                if code not in labels:
+                    labels[code] = _frame_label(code).replace(";", ":")
+            lines.append(";".join(labels[code] for code in stack) + f" {count}")
+        return "\n".join(lines) + "\n"
+
+    def top(self, n: int = TOP_N) -> list:
+        """
+        The `n` functions with the most samples on top of the stack, with the
+        share of samples spent in them (self) and in their callees (total).
+        """
+        own = Counter()
+        total = Counter()
+        for stack, count in self.samples.items():
+            own[stack[-1]] += count
+            for code in set(stack):
+                total[code] += count
+        samples = sum(self.samples.values()) or 1
+        return [
+            {
+                "function": _frame_label(code),
+                "self %": round(100 * count / samples, 1),
+                "total %": round(100 * total[code] / samples, 1),
+            }
+            for code, count in own.most_common(n)
+        ]
+
+    def save(self, name: str, directory: str = PROFILE_DIR) -> str:
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_") or "page"
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(directory, f"{slug}-{stamp}-{os.getpid()}.folded")
+        with open(path, "w") as f:
+            f.write(self.folded())
+        return path
+
+
+def profiling() -> bool:
+    """
+    Whether the current thread is running a profiled page.
+    """
+    return getattr(_local, "active", False)
+
+
+def profile_page(script_path: str, name: str):
+    """
+    Run a page script under the profiler, then show its hottest functions in
+    the sidebar and where the profile was saved.
+    """
+    import streamlit as st
+
+    profile = SamplingProfiler(threading.get_ident())
+    _local.active = True
+    profile.start()
+    try:
+        runpy.run_path(script_path, run_name="__main__")
+    finally:
+        profile.stop()
+        _local.active = False
+        path = profile.save(name)
+        samples = sum(profile.samples.values())
+        with st.sidebar.expander(f"Profile: top {TOP_N} functions"):
+            st.caption(
+                f"{samples} samples over {profile.duration:.2f}s, saved to {path}"
+            )
+            st.dataframe(profile.top(), use_container_width=True)
@@ -0,0 +1,207 @@
+import datetime
+import json
+import os
+import tempfile
+
+import polars as pl
+import pyarrow as pa
+from schemas import SCHEMA_VERSION
+
+# ----------------------------
+# Rollup pyramid of the weather history
+
+# The half-hourly readings are rolled up into hourly, daily and monthly
+# buckets as they are mirrored (see `sync.update_mirror`), so a history view
+# reads a few hundred buckets instead of resampling every reading. Each
+# bucket keeps the count, sum, min and max of every field, which merge into
+# the next resolution up without going back to the readings.
+FIELDS = ["temp", "humi", "pres", "wvel", "rain", "cldy", "p_aqi"]
+
+# Resolution -> (polars truncation, approximate bucket width in seconds),
+# finest first
+RESOLUTIONS = {
+    "hour": ("1h", 3600),
+    "day": ("1d", 86400),
+    "month": ("1mo", 30 * 86400),
+}
+
+# Buckets are in Manila time (UTC+8, no daylight saving time), like the page
+UTC_OFFSET = datetime.timedelta(hours=8)
+
+# Most buckets a history view should read
+MAX_ROWS = int(os.environ.get("WEATHER_HISTORY_ROWS", 1000))
+
+STATE_FILE = "state.json"
+
+
+def rollup_dir() -> str:
+    from sync import MIRROR_DIR
+
+    return os.path.join(MIRROR_DIR, f"weather_rollups.v{SCHEMA_VERSION}")
+
+
+def read_state() -> dict:
+    try:
+        with open(os.path.join(rollup_dir(), STATE_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _write(path: str, write):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def _read_buckets(resolution: str) -> pl.DataFrame:
+    path = os.path.join(rollup_dir(), f"{resolution}.arrow")
+    if not os.path.exists(path):
+        return None
+    source = pa.memory_map(path, "r")
+    return pl.from_arrow(pa.ipc.open_file(source).read_all())
+
+
+def _write_buckets(resolution: str, df: pl.DataFrame):
+    table = df.to_arrow()
+
+    def write(f):
+        with pa.ipc.new_file(f, table.schema) as writer:
+            writer.write_table(table)
+
+    _write(os.path.join(rollup_dir(), f"{resolution}.arrow"), write)
+
+
+def _aggregate(readings: pa.Table) -> pl.DataFrame:
+    """
+    Hourly buckets of weather readings.
+    """
+    dt00 = readings["dt00"].cast(pa.timestamp("us"))  # naive UTC
+    df = pl.from_arrow(readings.select(FIELDS)).with_columns(
+        [pl.col(field).cast(pl.Float64) for field in FIELDS]
+    )
+    df = df.with_columns(
+        (pl.from_arrow(dt00) + UTC_OFFSET).dt.truncate("1h").alias("bucket")
+    )
+    aggs = []
+    for field in FIELDS:
+        column = pl.col(field)
+        aggs += [
+            column.is_not_null().sum().cast(pl.Int64).alias(f"{field}_n"),
+            column.sum().alias(f"{field}_sum"),
+            column.min().alias(f"{field}_min"),
+            column.max().alias(f"{field}_max"),
+        ]
+    return df.groupby("bucket").agg(aggs).sort("bucket")
+
+
+def _coarsen(buckets: pl.DataFrame, every: str) -> pl.DataFrame:
+    """
+    Merge buckets into coarser ones.
+    """
+    aggs = []
+    for field in FIELDS:
+        aggs += [
+            pl.col(f"{field}_n").sum(),
+            pl.col(f"{field}_sum").sum(),
+            pl.col(f"{field}_min").min(),
+            pl.col(f"{field}_max").max(),
+        ]
+    bucket = pl.col("bucket").dt.truncate(every)
+    return buckets.groupby(bucket).agg(aggs).sort("bucket")
+
+
+def update_rollups(mirror_version: int):
+    """
+    Roll the weather readings mirrored since the last update up into every
+    resolution.
+
+    Only the buckets from the hour of the last rolled up reading on are
+    recomputed: the readings of that hour from the mirror, and the coarser
+    buckets from the finer ones. Called with the mirror's lock held.
+    """
+    from sync import read_window
+
+    state = read_state()
+    if state.get("mirror_version") == mirror_version:
+        return
+
+    start = None
+    if "watermark" in state:
+        watermark = datetime.datetime.fromtimestamp(
+            state["watermark"] / 1e6, tz=datetime.timezone.utc
+        )
+        start = watermark.replace(minute=0, second=0, microsecond=0)
+    readings = read_window("weather", start=start)
+    if readings.num_rows == 0:
+        return
+
+    os.makedirs(rollup_dir(), exist_ok=True)
+    hourly = _aggregate(readings)
+    first = hourly["bucket"].min()
+    finer = None
+    for resolution, (every, _) in RESOLUTIONS.items():
+        # First bucket of this resolution with new readings
+        first = pl.Series([first]).dt.truncate(every)[0]
+        if finer is None:
+            fresh = hourly
+        else:
+            fresh = _coarsen(finer.filter(pl.col("bucket") >= first), every)
+
+        old = _read_buckets(resolution)
+        if old is not None:
+            fresh = pl.concat([old.filter(pl.col("bucket") < first), fresh])
+        _write_buckets(resolution, fresh)
+        finer = fresh
+
+    state = {
+        "watermark": readings["dt00"].cast(pa.int64()).to_numpy().max().item(),
+        "mirror_version": mirror_version,
+        "version": state.get("version", 0) + 1,
+    }
+    _write(
+        os.path.join(rollup_dir(), STATE_FILE),
+        lambda f: f.write(json.dumps(state).encode()),
+    )
+
+
+# ----------------------------
+# Reading
+
+
+def pick_resolution(start: datetime.datetime, end: datetime.datetime) -> str:
+    """
+    The finest resolution with at most MAX_ROWS buckets between `start` and
+    `end`, so that a view reads about as many rows whatever its range.
+    """
+    seconds = (end - start).total_seconds()
+    for resolution, (_, width) in RESOLUTIONS.items():
+        if seconds / width <= MAX_ROWS:
+            return resolution
+    return resolution
+
+
+def read_rollup(resolution: str, start=None, end=None) -> pl.DataFrame:
+    """
+    The buckets of a resolution between `start` and `end` (Manila time,
+    inclusive), with the min, mean and max of every field.
+    """
+    df = _read_buckets(resolution)
+    columns = ["bucket"] + [
+        f"{field}_{stat}" for field in FIELDS for stat in ("min", "mean", "max")
+    ]
+    if df is None:
+        schema = {column: pl.Float64 for column in columns}
+        return pl.DataFrame(schema={**schema, "bucket": pl.Datetime("us")})
+
+    if start is not None:
+        df = df.filter(pl.col("bucket") >= start)
+    if end is not None:
+        df = df.filter(pl.col("bucket") <= end)
+    return df.with_columns(
+        [
+            (pl.col(f"{field}_sum") / pl.col(f"{field}_n")).alias(f"{field}_mean")
+            for field in FIELDS
+        ]
+    ).select(columns)
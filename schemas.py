@@ -0,0 +1,99 @@
+import datetime
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# ----------------------------
+# Declared schemas of the Deta Bases
+
+# Timestamps are kept at microsecond resolution since that is what Delta Lake
+# stores. Deta sends them as epoch seconds and dates as ISO strings; see
+# `decode_page` for the conversion.
+SCHEMAS = {
+    "gh_commits": pa.schema(
+        [
+            ("key", pa.string()),
+            ("date", pa.date32()),
+            ("value", pa.int64()),
+        ]
+    ),
+    "solve": pa.schema(
+        [
+            ("key", pa.string()),
+            ("event", pa.string()),
+            ("type", pa.string()),
+            ("timestamp", pa.timestamp("us")),
+            ("value", pa.int64()),
+        ]
+    ),
+    "weather": pa.schema(
+        [
+            ("key", pa.string()),
+            ("dt00", pa.timestamp("us", tz="UTC")),
+            ("sunr", pa.timestamp("us", tz="UTC")),
+            ("suns", pa.timestamp("us", tz="UTC")),
+            ("city", pa.string()),
+            ("desc", pa.string()),
+            ("icon", pa.string()),
+            ("temp", pa.float64()),
+            ("humi", pa.float64()),
+            ("pres", pa.float64()),
+            ("wvel", pa.float64()),
+            ("wdeg", pa.int64()),
+            ("cldy", pa.float64()),
+            ("rain", pa.float64()),
+            ("p_aqi", pa.int64()),
+        ]
+    ),
+}
+
+# Bumped whenever a schema above or the layout the mirrors and snapshots are
+# stored in changes, so that local mirrors are rebuilt and old snapshots are
+# not read as new ones.
+SCHEMA_VERSION = 2
+
+
+def _wire_type(data_type: pa.DataType) -> pa.DataType:
+    """
+    Type of a column as it is sent by Deta.
+    """
+    if pa.types.is_date(data_type):
+        return pa.string()
+    if pa.types.is_timestamp(data_type):
+        return pa.int64()
+    return data_type
+
+
+def _decode_column(array: pa.Array, data_type: pa.DataType) -> pa.Array:
+    if pa.types.is_date(data_type):
+        return pc.strptime(array, format="%Y-%m-%d", unit="s").cast(data_type)
+    if pa.types.is_timestamp(data_type):
+        return pc.multiply(array, 1_000_000).cast(data_type)
+    return array
+
+
+def decode_page(base_name: str, items: list) -> pa.RecordBatch:
+    """
+    Decode a page of Deta items into a typed record batch.
+
+    Fields missing from an item become nulls and unknown fields are ignored,
+    so no per-row Python parsing is needed after this point.
+    """
+    schema = SCHEMAS[base_name]
+    wire_schema = pa.schema([(f.name, _wire_type(f.type)) for f in schema])
+    batch = pa.RecordBatch.from_pylist(items, schema=wire_schema)
+    columns = [_decode_column(batch[f.name], f.type) for f in schema]
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def deta_value(value):
+    """
+    Convert a decoded scalar back to the form Deta stores, for use in queries.
+    """
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return int(value.timestamp())
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
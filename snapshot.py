@@ -0,0 +1,251 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import pyarrow as pa
+from schemas import SCHEMA_VERSION
+from sync import mirror_version, read_mirror, read_window, update_mirror
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# ----------------------------
+# Snapshot store shared by all Streamlit processes of a machine
+
+# Each dataset is written once as an Arrow IPC file which every process
+# memory-maps read-only, so N workers hold one copy of the data in the page
+# cache instead of N copies on their heaps. Only frames that wrap the mapped
+# buffers share it: publish a dataset in the shape it is drawn in, not the
+# raw rows it is derived from.
+#
+# The Delta mirror of a Base is only synced, compacted and read with the
+# Base's lock held (see `mirror_lock`), so one process at a time fetches
+# from Deta and no process reads files another one is vacuuming.
+SNAPSHOT_DIR = os.environ.get(
+    "SNAPSHOT_DIR",
+    "/dev/shm/howisjsk" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+)
+
+_mapped = {}
+_thread_locks = {}
+_thread_locks_lock = threading.Lock()
+
+
+def _manifest_path(name: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"{name}.json")
+
+
+def read_manifest(name: str):
+    """
+    Return the manifest of the published snapshot of a dataset, if any.
+
+    Snapshots published with another `SCHEMA_VERSION` are ignored, as their
+    layout may differ.
+    """
+    try:
+        with open(_manifest_path(name)) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if manifest.get("schema_version") != SCHEMA_VERSION:
+        return None
+    return manifest
+
+
+def _write_atomic(path: str, write):
+    fd, tmp_path = tempfile.mkstemp(dir=SNAPSHOT_DIR, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _write_manifest(name: str, manifest: dict):
+    _write_atomic(
+        _manifest_path(name), lambda f: f.write(json.dumps(manifest).encode())
+    )
+
+
+def publish(name: str, table: pa.Table, version: str) -> None:
+    """
+    Publish a new version of a dataset for all processes.
+    """
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    table = table.replace_schema_metadata({"version": version})
+    path = os.path.join(SNAPSHOT_DIR, f"{name}.{version}.arrow")
+
+    def write_table(f):
+        with pa.ipc.new_file(f, table.schema) as writer:
+            writer.write_table(table)
+
+    _write_atomic(path, write_table)
+
+    _write_manifest(
+        name,
+        {
+            "schema_version": SCHEMA_VERSION,
+            "version": version,
+            "path": path,
+            "synced_at": time.time(),
+        },
+    )
+
+    # Processes that still map an older version keep their mapping alive
+    # after the file is unlinked.
+    for entry in os.listdir(SNAPSHOT_DIR):
+        if entry.startswith(f"{name}.") and entry.endswith(".arrow"):
+            if os.path.join(SNAPSHOT_DIR, entry) != path:
+                os.remove(os.path.join(SNAPSHOT_DIR, entry))
+
+
+def open_snapshot(name: str):
+    """
+    Memory-map the published snapshot of a dataset.
+
+    The mapping is reused for as long as the published version does not
+    change. Returns None if nothing has been published yet.
+    """
+    manifest = read_manifest(name)
+    if manifest is None:
+        return None
+
+    cached = _mapped.get(name)
+    if cached is not None and cached[0] == manifest["version"]:
+        return cached[1]
+
+    try:
+        source = pa.memory_map(manifest["path"], "r")
+    except FileNotFoundError:
+        # Replaced between reading the manifest and opening the file
+        return open_snapshot(name)
+    table = pa.ipc.open_file(source).read_all()
+    _mapped[name] = (manifest["version"], table)
+    return table
+
+
+def snapshot_version(table: pa.Table) -> str:
+    """
+    Version of the snapshot a table was read from.
+    """
+    return table.schema.metadata[b"version"].decode()
+
+
+class _RefreshLock:
+    """
+    Lock held while a dataset is refreshed, across threads and processes.
+    """
+
+    def __init__(self, name: str):
+        with _thread_locks_lock:
+            self.thread_lock = _thread_locks.setdefault(name, threading.Lock())
+        self.path = os.path.join(SNAPSHOT_DIR, f"{name}.lock")
+        self.file = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        if not self.thread_lock.acquire(blocking):
+            return False
+        if fcntl is None:
+            return True
+
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        self.file = open(self.path, "a")
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(self.file, flags)
+        except BlockingIOError:
+            self.file.close()
+            self.thread_lock.release()
+            return False
+        return True
+
+    def release(self):
+        if self.file is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+            self.file.close()
+            self.file = None
+        self.thread_lock.release()
+
+
+@contextmanager
+def mirror_lock(base_name: str):
+    """
+    Hold the lock of the mirror of a Deta Base, across threads and processes.
+    """
+    lock = _RefreshLock(base_name)
+    lock.acquire()
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+def _shared(deta, name: str, base_name: str, max_age: float, build) -> pa.Table:
+    """
+    Return the published snapshot `name`, built by `build()` from the mirror
+    of a Deta Base.
+
+    The mirror is synced from Deta only if the snapshot is older than
+    `max_age` seconds, and only by one process at a time; the others keep
+    serving the published snapshot meanwhile. The snapshot version is stored
+    in the table's schema metadata under `version`.
+    """
+    manifest = read_manifest(name)
+    if manifest is not None and time.time() - manifest["synced_at"] < max_age:
+        return open_snapshot(name)
+
+    lock = _RefreshLock(base_name)
+    if not lock.acquire(blocking=manifest is None):
+        return open_snapshot(name)
+
+    try:
+        # Another process may have published while we waited for the lock
+        manifest = read_manifest(name)
+        if manifest is None or time.time() - manifest["synced_at"] >= max_age:
+            update_mirror(deta, base_name)
+            version = f"{SCHEMA_VERSION}-{mirror_version(base_name)}"
+            if manifest is None or manifest["version"] != version:
+                publish(name, build(), version)
+            else:
+                manifest["synced_at"] = time.time()
+                _write_manifest(name, manifest)
+    finally:
+        lock.release()
+
+    return open_snapshot(name)
+
+
+def shared_base(deta, base_name: str, max_age: float, derive=None, name=None):
+    """
+    Return the rows of a Deta Base from the shared snapshot store.
+
+    With `derive`, the snapshot `name` holds `derive(rows)` instead, so that
+    the frame a page draws from is computed once per version and shared too.
+    """
+
+    def build():
+        rows = read_mirror(base_name)
+        return rows if derive is None else derive(rows)
+
+    return _shared(deta, name or base_name, base_name, max_age, build)
+
+
+def shared_window(deta, base_name: str, latest: int, max_age: float) -> pa.Table:
+    """
+    Return the `latest` rows of a Deta Base, newest first, from the shared
+    snapshot store.
+    """
+    return _shared(
+        deta,
+        f"{base_name}_latest{latest}",
+        base_name,
+        max_age,
+        lambda: read_window(base_name, latest=latest),
+    )
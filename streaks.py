@@ -0,0 +1,164 @@
+import hashlib
+import threading
+from typing import NamedTuple
+
+import numpy as np
+import polars as pl
+
+# ----------------------------
+# Run-length streak engine
+
+
+class StreakInfo(NamedTuple):
+    current: int
+    longest: int
+    intervals: pl.DataFrame
+
+
+def _encode_runs(first_day: int, days: np.ndarray, active: np.ndarray):
+    """
+    Run-length encode a daily activity flag over the calendar from
+    `first_day` to `days[-1]`. Days missing from `days` are inactive.
+
+    Returns the start day, end day, length and activity of every run.
+    """
+    dense = np.zeros(days[-1] - first_day + 1, dtype=bool)
+    dense[days - first_day] = active
+
+    bounds = np.flatnonzero(dense[1:] != dense[:-1]) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [len(dense)]))
+    return (
+        first_day + starts,
+        first_day + ends - 1,
+        ends - starts,
+        dense[starts],
+    )
+
+
+def _digest(days: np.ndarray, active: np.ndarray) -> bytes:
+    digest = hashlib.blake2b(days.tobytes(), digest_size=16)
+    digest.update(active.tobytes())
+    return digest.digest()
+
+
+class StreakTracker:
+    """
+    Streaks of a daily series, updated incrementally as days are appended.
+
+    Runs that ended before the last (open) run are kept between updates, so
+    an update only re-encodes the days from the start of the open run on.
+    The days before that are only hashed: if they changed, or the series no
+    longer reaches the open run, the whole series is encoded again.
+    """
+
+    def __init__(self, null_value=0, count_null_streak: bool = False):
+        self.null_value = null_value
+        self.count_null_streak = count_null_streak
+        self._closed = []  # (start, end, length, active) of finished runs
+        self._open = None
+        self._prefix = None  # digest of the days before the open run
+        self._lock = threading.Lock()
+
+    def _counts(self, active: bool) -> bool:
+        return active or self.count_null_streak
+
+    def update(self, days: np.ndarray, values: np.ndarray) -> StreakInfo:
+        """
+        Update the streaks with a full series sorted by day, given as days
+        since the epoch, and return them.
+        """
+        with self._lock:
+            return self._update(days, values)
+
+    def _update(self, days: np.ndarray, values: np.ndarray) -> StreakInfo:
+        if len(days) == 0:
+            self._closed, self._open = [], None
+            return StreakInfo(0, 0, self.intervals())
+
+        active = values != self.null_value
+        first_day = None
+        if self._open is not None and days[0] <= self._open[0] <= days[-1]:
+            tail = int(np.searchsorted(days, self._open[0]))
+            if _digest(days[:tail], active[:tail]) == self._prefix:
+                first_day = self._open[0]
+        if first_day is None:
+            self._closed, self._open = [], None
+            first_day, tail = days[0], 0
+
+        runs = list(zip(*_encode_runs(first_day, days[tail:], active[tail:])))
+        runs = [(int(s), int(e), int(n), bool(a)) for s, e, n, a in runs]
+
+        # The open run may have changed kind, e.g. when the value of its last
+        # day was corrected, and now continue the last closed run.
+        if self._closed and self._closed[-1][3] == runs[0][3]:
+            start, _, length, kind = self._closed.pop()
+            runs[0] = (start, runs[0][1], length + runs[0][2], kind)
+
+        self._closed.extend(runs[:-1])
+        self._open = runs[-1]
+        tail = int(np.searchsorted(days, self._open[0]))
+        self._prefix = _digest(days[:tail], active[:tail])
+        return self.info()
+
+    def intervals(self) -> pl.DataFrame:
+        runs = self._closed + ([self._open] if self._open else [])
+        start, end, length, active = zip(*runs) if runs else ([], [], [], [])
+        return pl.DataFrame(
+            {
+                "start": pl.Series(start, dtype=pl.Int32).cast(pl.Date),
+                "end": pl.Series(end, dtype=pl.Int32).cast(pl.Date),
+                "length": pl.Series(length, dtype=pl.Int64),
+                "active": pl.Series(active, dtype=pl.Boolean),
+            }
+        )
+
+    def info(self) -> StreakInfo:
+        if self._open is None:
+            return StreakInfo(0, 0, self.intervals())
+
+        counted = [
+            run[2] for run in self._closed + [self._open] if self._counts(run[3])
+        ]
+        current = self._open[2] if self._counts(self._open[3]) else 0
+        return StreakInfo(current, max(counted, default=0), self.intervals())
+
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+
+def streak_info(
+    df: pl.DataFrame,
+    date_column: str,
+    streak_columns: list,
+    key: str = None,
+    null_value=0,
+    count_null_streak: bool = False,
+) -> dict:
+    """
+    Compute the current streak, longest streak and streak intervals of each
+    of `streak_columns` in one pass.
+
+    A streak is a run of consecutive days whose value is not `null_value`;
+    days missing from `df` break streaks. With `count_null_streak`, runs of
+    null days count as streaks too. When `key` is given, the streak state is
+    kept between calls with the same key and only extended with new days.
+    """
+    df = df.select([date_column, *streak_columns]).sort(date_column)
+    days = df[date_column].cast(pl.Int32).to_numpy()
+
+    results = {}
+    for column in streak_columns:
+        values = df[column].to_numpy()
+        if key is None:
+            tracker = StreakTracker(null_value, count_null_streak)
+        else:
+            with _trackers_lock:
+                tracker = _trackers.setdefault(
+                    (key, column, null_value, count_null_streak),
+                    StreakTracker(null_value, count_null_streak),
+                )
+        results[column] = tracker.update(days, values)
+
+    return results
@@ -0,0 +1,265 @@
+import os
+import threading
+import time
+import warnings
+from typing import Optional
+
+import polars as pl
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from deltalake import DeltaTable, write_deltalake
+from load import fetch_deta_base_table
+from schemas import SCHEMA_VERSION, SCHEMAS, decode_page, deta_value
+
+# ----------------------------
+# Local Delta Lake mirror of the Deta Bases
+
+MIRROR_DIR = os.environ.get("DETA_MIRROR_DIR", ".mirror")
+
+# Field used as the high-water mark of each Base. Rows at or above the
+# mirror's current maximum are fetched again on every sync so that late
+# updates to the newest rows (e.g. today's commit count) are picked up.
+WATERMARKS = {
+    "gh_commits": "date",
+    "solve": "timestamp",
+    "weather": "dt00",
+}
+
+SYNC_COLUMN = "_synced"
+COMPACT_AFTER_FILES = 64
+# Rows per Parquet row group of the mirror's files, which are sorted by the
+# watermark field so that `read_window` can skip row groups by their stats
+ROW_GROUP_ROWS = 4096
+
+_locks = {name: threading.Lock() for name in WATERMARKS}
+
+
+def mirror_path(base_name: str) -> str:
+    return os.path.join(MIRROR_DIR, f"{base_name}.v{SCHEMA_VERSION}")
+
+
+def _open_mirror(base_name: str) -> Optional[DeltaTable]:
+    path = mirror_path(base_name)
+    if not os.path.exists(os.path.join(path, "_delta_log")):
+        return None
+    return DeltaTable(path)
+
+
+def mirror_version(base_name: str) -> int:
+    """
+    Version of the rows of a mirror, or -1 if it does not exist yet.
+
+    This is the sync time of its newest rows rather than the Delta table
+    version, so that compactions and vacuums, which rewrite the files without
+    changing the rows, keep it.
+    """
+    dt = _open_mirror(base_name)
+    if dt is None:
+        return -1
+    with warnings.catch_warnings():
+        # deltalake builds the batch with an argument pyarrow deprecated
+        warnings.simplefilter("ignore", FutureWarning)
+        highs = dt.get_add_actions(flatten=True).to_pydict().get(f"max.{SYNC_COLUMN}")
+    if highs and None not in highs:
+        return max(highs)
+    synced = pc.max(dt.to_pyarrow_table(columns=[SYNC_COLUMN])[SYNC_COLUMN]).as_py()
+    return -1 if synced is None else synced
+
+
+def _latest_rows(table: pa.Table) -> pa.Table:
+    """
+    Keep only the most recently synced version of every key.
+    """
+    df = pl.from_arrow(table)
+    df = df.sort(SYNC_COLUMN).unique(subset="key", keep="last", maintain_order=True)
+    return df.to_arrow().cast(table.schema)
+
+
+def _mirror_schema(base_name: str) -> pa.Schema:
+    return SCHEMAS[base_name].append(pa.field(SYNC_COLUMN, pa.int64()))
+
+
+def _storage_schema(base_name: str) -> pa.Schema:
+    """
+    Schema the mirror is written with. Delta Lake has no timezone-aware
+    timestamps, so they are stored as naive UTC.
+    """
+    schema = _mirror_schema(base_name)
+    for i, field in enumerate(schema):
+        if pa.types.is_timestamp(field.type) and field.type.tz is not None:
+            schema = schema.set(i, field.with_type(pa.timestamp(field.type.unit)))
+    return schema
+
+
+def _read_delta(dt: DeltaTable, base_name: str) -> pa.Table:
+    """
+    Read a mirror with the declared types restored.
+    """
+    schema = _mirror_schema(base_name)
+    return dt.to_pyarrow_table(columns=schema.names).cast(schema)
+
+
+def read_mirror(base_name: str) -> pa.Table:
+    """
+    Read the local mirror of a Deta Base without contacting Deta.
+    """
+    dt = _open_mirror(base_name)
+    if dt is None:
+        return SCHEMAS[base_name].empty_table()
+    return _latest_rows(_read_delta(dt, base_name)).drop([SYNC_COLUMN])
+
+
+def _write_mirror(path: str, table: pa.Table, mode: str):
+    write_deltalake(
+        path,
+        table,
+        mode=mode,
+        min_rows_per_group=ROW_GROUP_ROWS,
+        max_rows_per_group=ROW_GROUP_ROWS,
+    )
+
+
+def _watermark(dt: DeltaTable, base_name: str):
+    field = WATERMARKS[base_name]
+    column = dt.to_pyarrow_table(columns=[field]).cast(
+        pa.schema([SCHEMAS[base_name].field(field)])
+    )[field]
+    return pc.max(column).as_py()
+
+
+def update_mirror(deta, base_name: str) -> None:
+    """
+    Append the items added to a Deta Base since the last sync to its mirror.
+
+    Only items whose watermark field is at or above the last synced value are
+    fetched from Deta, so the cost of a refresh depends on the number of new
+    rows rather than on the size of the whole history.
+    """
+    field = WATERMARKS[base_name]
+    path = mirror_path(base_name)
+
+    with _locks[base_name]:
+        dt = _open_mirror(base_name)
+        if dt is None:
+            query = None
+        else:
+            watermark = _watermark(dt, base_name)
+            query = {f"{field}?gte": deta_value(watermark)}
+
+        fetched = fetch_deta_base_table(
+            deta.Base(base_name),
+            query=query,
+            decode=lambda items: decode_page(base_name, items),
+        )
+        if dt is not None and fetched.num_rows:
+            # Rows at the watermark are fetched again on every sync; only
+            # append them if they changed.
+            known = read_window(base_name, start=watermark)
+            fetched = (
+                pl.from_arrow(fetched)
+                .join(pl.from_arrow(known), on=known.column_names, how="anti")
+                .to_arrow()
+                .cast(fetched.schema)
+            )
+        if fetched.num_rows:
+            fetched = fetched.append_column(
+                SYNC_COLUMN,
+                pa.array([time.time_ns()] * len(fetched), type=pa.int64()),
+            )
+            fetched = fetched.cast(_storage_schema(base_name)).sort_by(field)
+            os.makedirs(path, exist_ok=True)
+            _write_mirror(path, fetched, mode="append")
+
+        dt = _open_mirror(base_name)
+        if dt is not None and len(dt.files()) > COMPACT_AFTER_FILES:
+            latest = _latest_rows(_read_delta(dt, base_name))
+            latest = latest.cast(_storage_schema(base_name)).sort_by(field)
+            _write_mirror(path, latest, mode="overwrite")
+            DeltaTable(path).vacuum(
+                retention_hours=0, dry_run=False, enforce_retention_duration=False
+            )
+
+        if base_name == "weather":
+            # Roll the new readings up into the weather history's buckets
+            from rollup import update_rollups
+
+            update_rollups(mirror_version(base_name))
+
+
+def _watermark_stats(dt: DeltaTable, base_name: str):
+    """
+    Lowest and highest stored watermark value and row count of a mirror, from
+    the file statistics in its Delta log, or None if a file has none.
+    """
+    field = WATERMARKS[base_name]
+    with warnings.catch_warnings():
+        # deltalake builds the batch with an argument pyarrow deprecated
+        warnings.simplefilter("ignore", FutureWarning)
+        actions = dt.get_add_actions(flatten=True).to_pydict()
+    lows, highs = actions.get(f"min.{field}", []), actions.get(f"max.{field}", [])
+    if not lows or None in lows or None in highs:
+        return None
+    return min(lows), max(highs), sum(actions["num_records"])
+
+
+def read_window(base_name: str, latest: int = None, start=None, end=None) -> pa.Table:
+    """
+    Read the rows of a mirror whose watermark field lies between `start` and
+    `end` (inclusive), newest first, keeping at most `latest` rows.
+
+    The mirror's files are written sorted by the watermark field in small row
+    groups, so the range is pruned with the file and row group statistics.
+    For `latest`, the range is narrowed to the newest values first: as wide
+    as `latest` rows take at the mirror's average density, twice that, and
+    so on until enough rows are found. Reading the latest few rows thus reads
+    a row group or two, whatever the length of the history.
+    """
+    dt = _open_mirror(base_name)
+    if dt is None:
+        return SCHEMAS[base_name].empty_table()
+
+    field = WATERMARKS[base_name]
+    schema = _mirror_schema(base_name)
+    storage_type = _storage_schema(base_name).field(field).type
+    dataset = dt.to_pyarrow_dataset()
+
+    def bound(value):
+        scalar = pa.scalar(value, type=schema.field(field).type)
+        return scalar.cast(storage_type).as_py()
+
+    low = None if start is None else bound(start)
+    high = None if end is None else bound(end)
+
+    lower, width = low, None
+    stats = _watermark_stats(dt, base_name) if latest is not None else None
+    if stats is not None and stats[2] > latest:
+        first, last, rows = stats
+        high_seen = last if high is None else min(high, last)
+        width = (last - first) * latest / rows
+        lower = high_seen - width
+
+    while True:
+        if low is not None and lower is not None and lower <= low:
+            lower, width = low, None
+        predicate = None
+        if lower is not None:
+            predicate = ds.field(field) >= pa.scalar(lower, type=storage_type)
+        if high is not None:
+            upper = ds.field(field) <= pa.scalar(high, type=storage_type)
+            predicate = upper if predicate is None else predicate & upper
+
+        table = dataset.to_table(columns=schema.names, filter=predicate)
+        window = _latest_rows(table.cast(schema)).drop([SYNC_COLUMN])
+        if width is None or window.num_rows >= latest:
+            break
+        # Too few rows this close to the newest value: look twice as far back
+        width *= 2
+        lower = high_seen - width
+        if not width or lower <= first:
+            lower, width = low, None
+
+    window = window.sort_by([(field, "descending")])
+    if latest is not None:
+        window = window.slice(0, latest)
+    return window
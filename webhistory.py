@@ -0,0 +1,8 @@
+# ----------------------------
+# Layout of the web history archive, shared by the converter and its page
+
+# Parquet dataset the web history is converted to, under assets/
+WEBHISTORY_DATASET = "webhistory"
+
+# Host of a URL, with or without its scheme
+DOMAIN_PATTERN = r"^(?:[A-Za-z][A-Za-z0-9+.-]*://)?(?P<domain>[^/:?#]+)"
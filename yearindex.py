@@ -0,0 +1,79 @@
+from typing import NamedTuple
+
+import numpy as np
+import polars as pl
+
+# ----------------------------
+# Year index of a frame sorted by date
+
+
+class YearRange(NamedTuple):
+    start: int
+    stop: int
+    total: float
+    max: float
+
+
+class YearIndex:
+    """
+    Row range of every year of a frame sorted by date, with the year's total
+    and maximum of a value column.
+
+    Built once per dataset version by the loaders, so a per-year view is a
+    slice of the frame instead of a scan of its dates.
+    """
+
+    def __init__(self, ranges: dict):
+        self.ranges = ranges
+
+    @property
+    def years(self) -> list:
+        return list(self.ranges)
+
+    def take(self, frame, year: int = None):
+        """
+        The rows of `year` in `frame` (all of them without a year), as a
+        view. Years without data give an empty frame.
+        """
+        if year is None:
+            return frame
+        start, stop, _, _ = self.ranges.get(year, (0, 0, 0, 0))
+        if isinstance(frame, pl.DataFrame):
+            return frame.slice(start, stop - start)
+        return frame.iloc[start:stop]
+
+    def total(self, year: int = None):
+        if year is None:
+            return sum(r.total for r in self.ranges.values())
+        return self.ranges[year].total if year in self.ranges else 0
+
+    def max(self, year: int = None):
+        if year is None:
+            return max((r.max for r in self.ranges.values()), default=0)
+        return self.ranges[year].max if year in self.ranges else 0
+
+
+def year_index(frame, date_column: str, value_column: str) -> YearIndex:
+    """
+    Index a polars or pandas frame sorted by `date_column`.
+    """
+    dates = np.asarray(frame[date_column].to_numpy(), dtype="datetime64[D]")
+    values = frame[value_column].to_numpy()
+    if len(dates) == 0:
+        return YearIndex({})
+    if (dates[1:] < dates[:-1]).any():
+        raise ValueError(f"Frame is not sorted by {date_column}")
+
+    years = dates.astype("datetime64[Y]").astype(int) + 1970
+    starts = np.concatenate(([0], np.flatnonzero(years[1:] != years[:-1]) + 1))
+    stops = np.append(starts[1:], len(years))
+    totals = np.add.reduceat(values, starts)
+    maxima = np.maximum.reduceat(values, starts)
+    return YearIndex(
+        {
+            int(years[start]): YearRange(
+                int(start), int(stop), totals[i].item(), maxima[i].item()
+            )
+            for i, (start, stop) in enumerate(zip(starts, stops))
+        }
+    )